@@ -3,17 +3,22 @@ UNEP FI Report Citation Search System
 Web Application with Streamlit - Professional Edition
 """
 
+from __future__ import annotations
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from citation_search_engine import (
-    search_single_report, 
-    search_multiple_reports,
-    load_data_with_encoding
-)
+import gzip
+import hashlib
+import io
+import json
 import os
 import re
-from typing import Set
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Set
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
 
 st.set_page_config(
     page_title="UNEP FI Citation Search",
@@ -362,14 +367,21 @@ def parse_keyword_query(query: str) -> dict:
     keywords = [normalize_keyword(kw) for kw in keywords if kw.strip()]
     return {'operator': operator, 'keywords': keywords}
 
-def search_papers_by_keywords(df: pd.DataFrame, query: str) -> pd.DataFrame:
+def search_papers_by_keywords(df: pd.DataFrame, query: str, store_path=None) -> np.ndarray:
+    """
+    按关键词筛选论文，返回与 df 行对齐的布尔掩码（不复制数据）
+    提供 SQLite 存储时先用全文索引取得候选论文，只对候选行执行正则匹配
+    """
+    import numpy as np
+    import pandas as pd
+    from citation_store import store_keyword_candidates
     if df is None or df.empty:
-        return pd.DataFrame()
+        return np.zeros(0, dtype=bool)
     parsed = parse_keyword_query(query)
     operator = parsed['operator']
     keywords = parsed['keywords']
     if not keywords:
-        return pd.DataFrame()
+        return np.zeros(len(df), dtype=bool)
     
     all_variants = []
     keyword_info = []
@@ -412,47 +424,312 @@ def search_papers_by_keywords(df: pd.DataFrame, query: str) -> pd.DataFrame:
     
     if title_col is None:
         st.error("❌ 'Title' column not found")
-        return pd.DataFrame()
+        return np.zeros(len(df), dtype=bool)
+    
+    candidate_rows = store_keyword_candidates(store_path, all_variants, operator) if store_path else None
+    candidates = df if candidate_rows is None else df.iloc[candidate_rows]
     
     if operator == 'AND' or operator == 'PHRASE':
         # AND 或 PHRASE: 所有关键词/短语都必须匹配
-        mask = pd.Series([True] * len(df), index=df.index)
+        candidate_mask = pd.Series([True] * len(candidates), index=candidates.index)
         for variants in all_variants:
-            keyword_mask = df[title_col].apply(lambda x: text_contains_variants(x, variants))
+            keyword_mask = candidates[title_col].apply(lambda x: text_contains_variants(x, variants))
             if abstract_col:
-                keyword_mask |= df[abstract_col].apply(lambda x: text_contains_variants(x, variants))
-            mask &= keyword_mask
+                keyword_mask |= candidates[abstract_col].apply(lambda x: text_contains_variants(x, variants))
+            candidate_mask &= keyword_mask
     else:
         # OR: 任一关键词匹配即可
-        mask = pd.Series([False] * len(df), index=df.index)
+        candidate_mask = pd.Series([False] * len(candidates), index=candidates.index)
         for variants in all_variants:
-            keyword_mask = df[title_col].apply(lambda x: text_contains_variants(x, variants))
+            keyword_mask = candidates[title_col].apply(lambda x: text_contains_variants(x, variants))
             if abstract_col:
-                keyword_mask |= df[abstract_col].apply(lambda x: text_contains_variants(x, variants))
-            mask |= keyword_mask
+                keyword_mask |= candidates[abstract_col].apply(lambda x: text_contains_variants(x, variants))
+            candidate_mask |= keyword_mask
+    
+    if candidate_rows is None:
+        mask = candidate_mask.to_numpy(dtype=bool)
+    else:
+        mask = np.zeros(len(df), dtype=bool)
+        mask[candidate_rows] = candidate_mask.to_numpy(dtype=bool)
+    mask.flags.writeable = False
+    st.session_state['keyword_search_info'] = {'query': query, 'operator': operator, 'keywords': keyword_info, 'result_count': int(mask.sum())}
+    return mask
+
+REGIONS_FILE = "all reference with regions.csv"
+DEFAULT_SCOPUS_FILE = "Complete_References_Scopus_FULL.csv"
+DEFAULT_REPORTS_FILE = "UNEP FI Reports Title.csv"
+LEADERBOARD_FILE = "citation_leaderboard.json"
+STORE_FILE = "citation_store.db"
+# 批量搜索的检查点目录：进程被回收或浏览器断开后，重新运行相同的批量搜索会跳过已完成的报告
+CHECKPOINT_DIR = ".checkpoints"
+# 应用批量搜索的检查点只用于中断后继续，超过期限或总大小上限的旧文件在每次批量搜索前删除
+CHECKPOINT_MAX_AGE_SECONDS = 7 * 24 * 3600
+CHECKPOINT_MAX_BYTES = 512 * 1024 * 1024
+# 上传的Scopus数据构建的语料库在进程内最多占用的内存，超出时淘汰最久未使用的
+UPLOAD_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+# 进程内缓存的单个报告评分表数
+SCORE_TABLE_CACHE_ENTRIES = 64
+# 相似度滑块的最小值，必须等于 citation_search_engine.SCORE_FLOOR（评分表最低按此打分）；
+# 侧边栏在导入搜索引擎之前渲染，因此在这里单独定义
+THRESHOLD_SLIDER_MIN = 70
+MATCH_MODE_LABELS = {'exact': 'Exact only (fastest)', 'exact_fuzzy': 'Exact + fuzzy',
+                     'full': 'Full (exact + fuzzy + word overlap)'}
+MATCH_METHOD_LABELS = {'doi_match': 'DOI/URL Match', 'exact_substring': 'Exact Match',
+                       'fuzzy_match': 'Fuzzy Match', 'word_overlap': 'Word Overlap'}
+
+@st.cache_resource(show_spinner=False)
+def load_scopus_corpus(file_path, file_mtime):
+    """
+    加载预置Scopus数据并构建语料库
+    进程内所有会话共享同一份只读数据（file_mtime 用于文件更新后失效缓存）
+    论文ID与regions数据链接，并保存在数据文件旁边供下次启动复用
+    """
+    from citation_search_engine import load_reference_corpus
+    regions_df = load_reference_regions_data()
+    regions_path = REGIONS_FILE if regions_df is not None else None
+    return load_reference_corpus(file_path, regions_df, regions_path)
+
+@st.cache_resource(show_spinner=False)
+def load_regions_corpus(file_path, file_mtime):
+    """由regions数据的 References 列构建语料库（没有单独的Scopus长表文件时使用）"""
+    from citation_search_engine import load_regions_reference_corpus
+    return load_regions_reference_corpus(file_path)
+
+@st.cache_resource(show_spinner=False)
+def load_store_corpus(file_path, file_mtime):
+    """打开 citation_store.py 构建的 SQLite 存储（只读，文本按需读取）"""
+    from citation_store import open_store_corpus
+    return open_store_corpus(file_path)
+
+def find_current_store(scopus_file):
+    """预置数据对应的 SQLite 存储存在且未过期时返回其路径"""
+    from citation_store import store_is_current
+    if not isinstance(scopus_file, str) or not os.path.exists(STORE_FILE):
+        return None
+    if scopus_file == REGIONS_FILE:
+        source_paths = [REGIONS_FILE]
+    else:
+        source_paths = [scopus_file] + ([REGIONS_FILE] if os.path.exists(REGIONS_FILE) else [])
+    return STORE_FILE if store_is_current(STORE_FILE, source_paths) else None
+
+def load_preloaded_corpus(scopus_file):
+    """
+    加载预置数据的语料库：有最新的 SQLite 存储时用存储，否则按文件构建（均为进程内共享）
     
-    result_df = df[mask].copy()
-    st.session_state['keyword_search_info'] = {'query': query, 'operator': operator, 'keywords': keyword_info, 'result_count': len(result_df)}
-    return result_df
+    Returns:
+        tuple: (语料库, SQLite存储路径或None)
+    """
+    store_path = find_current_store(scopus_file)
+    if store_path is not None:
+        return load_store_corpus(store_path, os.path.getmtime(store_path)), store_path
+    if scopus_file == REGIONS_FILE:
+        return load_regions_corpus(scopus_file, os.path.getmtime(scopus_file)), None
+    return load_scopus_corpus(scopus_file, os.path.getmtime(scopus_file)), None
 
-@st.cache_data
+@st.cache_resource(show_spinner=False)
+def load_preloaded_report_list(file_path, file_mtime):
+    """解析预置报告列表（进程内共享）"""
+    import pandas as pd
+    from citation_search_engine import parse_report_list
+    return parse_report_list(pd.read_csv(file_path))
+
+# 预热阶段 -> 界面显示的说明
+WARMUP_STAGES = {
+    'starting': "starting",
+    'regions': "loading paper metadata",
+    'corpus': "building the reference index",
+    'reports': "loading the report list",
+    'leaderboard': "loading the citation leaderboard",
+    'search': "preparing the search engine",
+    'ready': "ready"
+}
+
+def warm_up(state):
+    """
+    在后台线程中加载预置数据并构建全部索引，结果存入与会话共用的 cache_resource 缓存
+    出错时只记录错误：会话加载数据时会重新尝试并显示错误
+    """
+    try:
+        state['stage'] = 'regions'
+        load_reference_regions_data()
+        
+        corpus = None
+        scopus_file = DEFAULT_SCOPUS_FILE if os.path.exists(DEFAULT_SCOPUS_FILE) else REGIONS_FILE
+        if os.path.exists(scopus_file):
+            state['stage'] = 'corpus'
+            corpus, _ = load_preloaded_corpus(scopus_file)
+        
+        report_titles = []
+        if os.path.exists(DEFAULT_REPORTS_FILE):
+            state['stage'] = 'reports'
+            report_titles, report_metadata = load_preloaded_report_list(DEFAULT_REPORTS_FILE,
+                                                                        os.path.getmtime(DEFAULT_REPORTS_FILE))
+        if os.path.exists(LEADERBOARD_FILE):
+            state['stage'] = 'leaderboard'
+            load_citation_leaderboard(LEADERBOARD_FILE, os.path.getmtime(LEADERBOARD_FILE))
+        
+        # 在一小段语料上完整走一遍打分流程（模糊匹配库、正则、存储连接等的一次性初始化）
+        if corpus is not None and report_titles:
+            import numpy as np
+            from citation_search_engine import SCORE_FLOOR, score_report
+            state['stage'] = 'search'
+            title = report_titles[0]
+            score_report(title, corpus, np.arange(min(corpus['size'], 1000)), min_threshold=SCORE_FLOOR,
+                         report_meta=report_metadata.get(title))
+    except Exception as e:
+        state['error'] = str(e)
+    finally:
+        state['stage'] = 'ready'
+        state['ready'].set()
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up():
+    """进程内只启动一次后台预热线程，返回其状态（'stage'、'error'、'ready' 事件）"""
+    state = {'stage': 'starting', 'error': None, 'ready': threading.Event()}
+    threading.Thread(target=warm_up, args=(state,), name="citation-warm-up", daemon=True).start()
+    return state
+
+def wait_for_warm_up():
+    """预热未完成时显示进度并等待：请求排队到数据和索引就绪后再执行，首次搜索与之后一样快"""
+    state = start_warm_up()
+    if state['ready'].is_set():
+        return
+    placeholder = st.empty()
+    while not state['ready'].wait(0.5):
+        placeholder.info(f"⏳ The server is warming up ({WARMUP_STAGES[state['stage']]})... "
+                         "Your request will continue automatically.")
+    placeholder.empty()
+
+@st.cache_resource(show_spinner=False)
+def get_upload_cache():
+    """进程内共享的上传语料库缓存：(内容哈希, regions数据版本) -> 语料库，按最近使用顺序排列"""
+    return {'entries': OrderedDict(), 'bytes': 0, 'lock': threading.Lock()}
+
+def uploaded_file_hash(uploaded_file):
+    """上传文件的内容哈希（每个会话对同一次上传只计算一次）"""
+    hashes = st.session_state.setdefault('upload_hashes', {})
+    if uploaded_file.file_id not in hashes:
+        hashes[uploaded_file.file_id] = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    return hashes[uploaded_file.file_id]
+
+def load_uploaded_corpus(uploaded_file, regions_df):
+    """
+    按内容哈希缓存上传的Scopus数据构建的语料库
+    相同内容的文件（包括其他会话上传的）只解析和预处理一次；总内存超过
+    UPLOAD_CACHE_MAX_BYTES 时淘汰最久未使用的语料库
+    """
+    import pandas as pd
+    from citation_search_engine import build_reference_corpus, estimate_corpus_bytes, compute_paper_ids
+    regions_version = os.path.getmtime(REGIONS_FILE) if regions_df is not None else None
+    key = (uploaded_file_hash(uploaded_file), regions_version)
+    cache = get_upload_cache()
+    with cache['lock']:
+        entry = cache['entries'].get(key)
+        if entry is not None:
+            cache['entries'].move_to_end(key)
+            return entry['corpus']
+    
+    uploaded_df = pd.read_csv(io.BytesIO(uploaded_file.getvalue()))
+    corpus = build_reference_corpus(uploaded_df, paper_ids=compute_paper_ids(uploaded_df, regions_df),
+                                    regions_df=regions_df)
+    size = estimate_corpus_bytes(corpus)
+    
+    with cache['lock']:
+        if key not in cache['entries']:
+            cache['entries'][key] = {'corpus': corpus, 'bytes': size}
+            cache['bytes'] += size
+        # 至少保留刚加入的语料库
+        while cache['bytes'] > UPLOAD_CACHE_MAX_BYTES and len(cache['entries']) > 1:
+            _, evicted = cache['entries'].popitem(last=False)
+            cache['bytes'] -= evicted['bytes']
+        return cache['entries'][key]['corpus']
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_uploaded_report_list(content_hash, _data):
+    """按内容哈希缓存上传的报告列表"""
+    import pandas as pd
+    from citation_search_engine import parse_report_list
+    return parse_report_list(pd.read_csv(io.BytesIO(_data)))
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def get_search_cost_estimate(report_titles, match_mode, corpus_fingerprint, row_ids, _corpus):
+    """按报告选择、匹配模式和数据库范围缓存批量搜索的耗时估计"""
+    from citation_search_engine import estimate_search_cost
+    return estimate_search_cost(list(report_titles), _corpus, row_ids, match_mode)
+
+def format_duration(seconds):
+    """将秒数格式化为便于阅读的时长"""
+    if seconds < 60:
+        return f"{seconds:.0f} s" if seconds >= 10 else f"{seconds:.1f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
+
+@st.cache_resource(show_spinner=False)
+def get_score_table_cache():
+    """进程内共享的评分表缓存，按最近使用顺序排列"""
+    return {'entries': OrderedDict(), 'lock': threading.Lock()}
+
+def get_report_score_table(report_title, report_meta, corpus, row_ids, threshold, scan_callback=None):
+    """
+    按报告和数据库范围缓存评分表（在滑块最小值处打分一次）
+    移动相似度阈值滑块时只需重新筛选评分表，不再扫描语料库。
+    语料库的全文索引候选（SQLite 存储）只在 'candidate_threshold' 及以上可用：阈值不低于它时
+    在该阈值处用候选打分，滑块移到它以下时再全量扫描一次；已缓存的全量评分表适用于任何阈值。
+    扫描进度回调会更新页面元素，st.cache_data 无法回放这类调用，因此用进程内字典缓存；
+    命中缓存时不调用 scan_callback
+    """
+    import numpy as np
+    from citation_search_engine import SCORE_FLOOR, score_report
+    row_digest = None if row_ids is None else hashlib.sha256(np.asarray(row_ids).tobytes()).hexdigest()
+    key = (report_title, json.dumps(report_meta, sort_keys=True, default=str), corpus['fingerprint'], row_digest)
+    floor = SCORE_FLOOR
+    if corpus.get('candidate_rows') is not None and threshold >= corpus.get('candidate_threshold', SCORE_FLOOR):
+        floor = max(SCORE_FLOOR, corpus.get('candidate_threshold', SCORE_FLOOR))
+    cache = get_score_table_cache()
+    with cache['lock']:
+        for min_threshold in sorted({SCORE_FLOOR, floor}):
+            score_table = cache['entries'].get(key + (min_threshold,))
+            if score_table is not None:
+                cache['entries'].move_to_end(key + (min_threshold,))
+                return score_table
+    
+    key += (floor,)
+    score_table = score_report(report_title, corpus, row_ids, min_threshold=floor, report_meta=report_meta,
+                               scan_callback=scan_callback)
+    with cache['lock']:
+        cache['entries'][key] = score_table
+        while len(cache['entries']) > SCORE_TABLE_CACHE_ENTRIES:
+            cache['entries'].popitem(last=False)
+    return score_table
+
+def format_scan_progress(progress):
+    """扫描进度 -> 进度条文字（已扫描行数、吞吐量、剩余时间）"""
+    text = (f"Scanned {progress['rows_scanned']:,} of {progress['rows_total']:,} references · "
+            f"{progress['rows_per_second']:,.0f} refs/s")
+    if progress['eta_seconds']:
+        text += f" · about {format_duration(progress['eta_seconds'])} left"
+    return text
+
+@st.cache_resource(show_spinner=False)
+def load_citation_leaderboard(file_path, file_mtime):
+    """加载 build_leaderboard.py 预计算的排行榜（进程内共享）"""
+    from citation_search_engine import load_leaderboard
+    return load_leaderboard(file_path)
+
+@st.cache_resource(show_spinner=False)
 def load_reference_regions_data():
-    """加载regions数据，并预处理列名"""
+    """加载regions数据，并预处理列名（进程内共享，调用方不得修改）"""
     try:
-        if os.path.exists("all reference with regions.csv"):
-            df = pd.read_csv("all reference with regions.csv")
-            # 清理所有列名：去除首尾空格
-            df.columns = df.columns.str.strip()
-            # 创建标准化的Title列用于匹配
-            if 'Title' in df.columns:
-                df['Title_normalized'] = df['Title'].str.strip().str.lower()
-            else:
-                st.warning("⚠️ 'Title' column not found in 'all reference with regions.csv'")
-                return None
-            return df
+        if os.path.exists(REGIONS_FILE):
+            from citation_search_engine import load_regions_data
+            return load_regions_data(REGIONS_FILE)
         else:
             st.warning("⚠️ 'all reference with regions.csv' not found")
             return None
+    except ValueError as e:
+        st.warning(f"⚠️ {str(e)}")
+        return None
     except Exception as e:
         st.warning(f"⚠️ Could not load file: {str(e)}")
         return None
@@ -463,186 +740,342 @@ def display_disclaimer():
     • Data includes papers indexed in Scopus up to September 2025, excluding various reports.<br>
     • For questions, please contact: <a href="mailto:fan.su@un.org">fan.su@un.org</a></div>""", unsafe_allow_html=True)
 
-def find_column_value(df_row, possible_column_names, default='N/A'):
+# 匹配明细中补充的论文信息 -> regions数据中可能的列名
+ENRICHMENT_COLUMNS = {
+    'first_author': ['First author', 'First Author', 'Authors', 'Author'],
+    'year': ['Year', 'Publication Year', 'Pub Year'],
+    'source_title': ['Source title', 'Source Title', 'Source', 'Journal'],
+    'doi': ['DOI', 'doi'],
+    'cited_by': ['Cited by', 'Cited By', 'Citations', 'Times Cited'],
+    'country': ['Country (First Author)', 'Country', 'Author Country']
+}
+
+def enrich_matches_with_regions_data(match_df, regions_df):
     """
-    增强的列查找函数，支持多种列名变体
+    用regions数据增强匹配明细（按论文ID整列连接，不逐条复制）
+    每个字段先按精确列名、再按不区分大小写的列名，取第一个非空的候选列，找不到时为 'N/A'
     
     Args:
-        df_row: DataFrame的一行
-        possible_column_names: 可能的列名列表
-        default: 默认值
+        match_df: match_frame 生成的匹配明细
+        regions_df: 带 'paper_id' 列的regions数据
     
     Returns:
-        找到的值或默认值
+        pd.DataFrame: 与 match_df 行对应，列为 ENRICHMENT_COLUMNS 的键
     """
-    # 首先尝试精确匹配
-    for col_name in possible_column_names:
-        if col_name in df_row.index:
-            val = df_row[col_name]
-            if pd.notna(val) and str(val).strip():
-                return val
-    
-    # 如果精确匹配失败，尝试不区分大小写的匹配
-    row_columns_lower = {col.strip().lower(): col for col in df_row.index}
-    for col_name in possible_column_names:
-        col_lower = col_name.strip().lower()
-        if col_lower in row_columns_lower:
-            actual_col = row_columns_lower[col_lower]
-            val = df_row[actual_col]
-            if pd.notna(val) and str(val).strip():
-                return val
-    
-    return default
-
-def enrich_matches_with_regions_data(matches, regions_df):
+    import numpy as np
+    import pandas as pd
+    if regions_df is None or regions_df.empty:
+        return pd.DataFrame('N/A', index=match_df.index, columns=list(ENRICHMENT_COLUMNS))
+    
+    # 每篇论文取regions数据中第一次出现的行
+    paper_rows = regions_df.drop_duplicates('paper_id').set_index('paper_id')
+    rows = paper_rows.reindex(match_df['paper_id'].to_numpy())
+    rows.index = match_df.index
+    columns_lower = {col.strip().lower(): col for col in rows.columns}
+    
+    enriched = {}
+    for field, possible_column_names in ENRICHMENT_COLUMNS.items():
+        candidates = [col for col in possible_column_names if col in rows.columns]
+        candidates += [columns_lower[col.strip().lower()] for col in possible_column_names
+                       if col.strip().lower() in columns_lower]
+        values = pd.Series('N/A', index=rows.index, dtype=object)
+        filled = np.zeros(len(rows), dtype=bool)
+        for col in candidates:
+            column = rows[col]
+            present = (column.notna() & column.astype(str).str.strip().ne('')).to_numpy() & ~filled
+            values[present] = column[present].astype(object)
+            filled |= present
+        enriched[field] = values
+    return pd.DataFrame(enriched)
+
+# 导出格式 -> (按钮名称, 文件扩展名, MIME类型)；Parquet 由 Streamlit 自带的 pyarrow 写出
+EXPORT_FORMATS = {
+    'csv': ('CSV', '.csv', 'text/csv'),
+    'csv.gz': ('CSV, gzip', '.csv.gz', 'application/gzip'),
+    'parquet': ('Parquet', '.parquet', 'application/vnd.apache.parquet')
+}
+# 导出时每块写出的行数（Parquet 的行组大小）
+EXPORT_CHUNK_ROWS = 20000
+
+def write_export(df, export_format):
+    """把表格写成下载文件的字节：CSV 按块写出（带BOM，Excel可直接打开），Parquet 每块一个行组"""
+    output = io.BytesIO()
+    if export_format == 'parquet':
+        # 混合类型的列（如 'N/A' 与年份）统一为字符串
+        df = df.astype({col: 'string' for col in df.columns if df[col].dtype == object})
+        df.to_parquet(output, index=False, row_group_size=EXPORT_CHUNK_ROWS)
+        return output.getvalue()
+    
+    stream = gzip.GzipFile(fileobj=output, mode='wb', mtime=0) if export_format == 'csv.gz' else output
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    for start in range(0, max(len(df), 1), EXPORT_CHUNK_ROWS):
+        df.iloc[start:start + EXPORT_CHUNK_ROWS].to_csv(text, index=False, header=start == 0)
+    text.flush()
+    text.detach()
+    if stream is not output:
+        stream.close()
+    return output.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_export(fingerprint, export_format, _build_frame):
+    """按结果指纹缓存导出文件（_build_frame 只在缓存未命中时调用）"""
+    return write_export(_build_frame(), export_format)
+
+def results_fingerprint(corpus, results):
+    """搜索结果的指纹：语料库指纹 + 每个报告的标题和匹配表"""
+    digest = hashlib.sha256(corpus['fingerprint'].encode('utf-8'))
+    for result in results:
+        digest.update(result['report_title'].encode('utf-8'))
+        digest.update(result['matches'].tobytes())
+    return digest.hexdigest()
+
+def display_export_buttons(label, fingerprint, build_frame, file_stem, key):
     """
-    用regions数据增强匹配结果
-    改进的匹配逻辑，更加健壮
+    显示 CSV / gzip CSV / Parquet 下载按钮
+    文件在点击时才由 build_frame 生成（在单独线程中运行，不阻塞页面），按 fingerprint 缓存；
+    点击下载不触发页面重新运行
     """
-    if regions_df is None or regions_df.empty:
-        # 如果没有regions数据，返回带有N/A的结果
-        enriched_matches = []
-        for match in matches:
-            enriched_match = match.copy()
-            enriched_match.update({
-                'first_author': 'N/A',
-                'year': 'N/A',
-                'source_title': 'N/A',
-                'doi': 'N/A',
-                'cited_by': 'N/A',
-                'country': 'N/A'
-            })
-            enriched_matches.append(enriched_match)
-        return enriched_matches
-    
-    enriched_matches = []
-    
-    for match in matches:
-        # 标准化citing paper的标题用于匹配
-        citing_title = match['citing_paper'].strip().lower()
-        
-        # 在regions_df中查找匹配的行
-        if 'Title_normalized' in regions_df.columns:
-            matching_rows = regions_df[regions_df['Title_normalized'] == citing_title]
-        else:
-            # 备用方案：直接比较Title列
-            matching_rows = regions_df[regions_df['Title'].str.strip().str.lower() == citing_title]
-        
-        enriched_match = match.copy()
-        
-        if not matching_rows.empty:
-            # 找到匹配的行，提取信息
-            row = matching_rows.iloc[0]
-            
-            # 使用增强的列查找函数
-            enriched_match['first_author'] = find_column_value(
-                row, ['First author', 'First Author', 'Authors', 'Author']
-            )
-            enriched_match['year'] = find_column_value(
-                row, ['Year', 'Publication Year', 'Pub Year']
-            )
-            enriched_match['source_title'] = find_column_value(
-                row, ['Source title', 'Source Title', 'Source', 'Journal']
-            )
-            enriched_match['doi'] = find_column_value(
-                row, ['DOI', 'doi']
+    columns = st.columns(len(EXPORT_FORMATS))
+    for column, (export_format, (format_label, extension, mime)) in zip(columns, EXPORT_FORMATS.items()):
+        with column:
+            st.download_button(
+                f"📥 {label} ({format_label})",
+                data=lambda export_format=export_format: build_export(fingerprint, export_format, build_frame),
+                file_name=f"{file_stem}{extension}",
+                mime=mime,
+                key=f"{key}_{export_format}",
+                on_click='ignore',
+                use_container_width=True
             )
-            enriched_match['cited_by'] = find_column_value(
-                row, ['Cited by', 'Cited By', 'Citations', 'Times Cited']
-            )
-            enriched_match['country'] = find_column_value(
-                row, ['Country (First Author)', 'Country', 'Author Country']
-            )
-        else:
-            # 没有找到匹配，使用N/A
-            enriched_match.update({
-                'first_author': 'N/A',
-                'year': 'N/A',
-                'source_title': 'N/A',
-                'doi': 'N/A',
-                'cited_by': 'N/A',
-                'country': 'N/A'
-            })
-        
-        enriched_matches.append(enriched_match)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_match_aggregates(match_table, _regions_df):
+    """按结果缓存维度统计（以列式匹配表为缓存键；regions数据进程内唯一，不参与哈希）"""
+    from citation_search_engine import aggregate_matches
+    return aggregate_matches(match_table, _regions_df)
+
+def display_match_aggregates(aggregates):
+    # plotly 只在需要画图时导入，不拖慢应用启动
+    import plotly.express as px
+    st.markdown("### 🌍 Citation Breakdown")
+    tabs = st.tabs([f"By {name}" for name in aggregates])
+    for tab, (name, agg_df) in zip(tabs, aggregates.items()):
+        with tab:
+            if name == 'Year':
+                fig = px.bar(agg_df, x='Year', y='Citations', title='Citations by Year of Citing Paper',
+                             color_discrete_sequence=['#009edb'])
+            elif name == 'Region':
+                fig = px.pie(agg_df, names='Region', values='Citations', title='Citations by Region',
+                             color_discrete_sequence=px.colors.qualitative.Set2)
+            else:
+                fig = px.bar(agg_df.head(15), x='Citations', y=name, orientation='h',
+                             title=f'Top 15 by {name}', color_discrete_sequence=['#56c02b'])
+                fig.update_layout(yaxis=dict(autorange='reversed'))
+            fig.update_layout(plot_bgcolor='white', paper_bgcolor='white', font=dict(family="Arial, sans-serif"))
+            st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(agg_df, use_container_width=True, hide_index=True)
+
+def display_quick_count(report_titles, corpus, threshold, row_ids, report_metadata, match_mode):
+    """
+    快速计数：在逐步扩大的分层抽样上估算各报告的引用数，每一步完成后刷新表格
+    最后一步扫描全部引用，结果与批量搜索的精确计数相同
+    """
+    import pandas as pd
+    from citation_search_engine import quick_count_reports
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    table = st.empty()
+
+    def progress_callback(scanned, total, estimates):
+        progress_bar.progress(scanned / total)
+        status_text.text(f"Scanned {scanned:,} of {total:,} references ({scanned / total:.0%})")
+        table.dataframe(pd.DataFrame([{
+            'Report Name': e['report_title'],
+            'Estimated Citations': round(e['estimate']),
+            f"{e['confidence']:.0%} Interval": f"{e['lower']:,} – {e['upper']:,}",
+            'Exact': '✅' if e['exact'] else ''
+        } for e in estimates]).sort_values('Estimated Citations', ascending=False),
+            use_container_width=True, hide_index=True)
+
+    try:
+        with st.spinner("Running quick count..."):
+            quick_count_reports(report_titles, corpus, threshold, row_ids, report_metadata, match_mode,
+                                progress_callback=progress_callback)
+        progress_bar.empty()
+        status_text.caption(f"Citations with similarity ≥ {threshold}%; counts are exact once 100% of the "
+                            "references have been scanned")
+    except Exception as e:
+        st.error(f"❌ Quick count error: {str(e)}")
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def compute_cocitation(report_paper_ids):
+    """按 {报告: 引用论文ID} 缓存共被引矩阵（排行榜每次加载都相同）"""
+    from citation_search_engine import build_cocitation_matrix
+    return build_cocitation_matrix(report_paper_ids)
+
+def display_cocitation(report_paper_ids, key, heatmap_size=20):
+    """显示报告共被引分析：被同一论文同时引用最多的报告对和热力图"""
+    import numpy as np
+    from citation_search_engine import top_cocitation_pairs
+    import plotly.express as px
+    cocitation_data = compute_cocitation(report_paper_ids)
+    pairs = top_cocitation_pairs(cocitation_data, top_n=50)
+    
+    st.markdown("### 🔗 Co-citation Analysis")
+    st.caption("Reports cited together by the same papers")
+    if pairs.empty:
+        st.info("No papers cite more than one of these reports")
+        return
     
-    return enriched_matches
+    pairs_df = pairs.rename(columns={'report_a': 'Report A', 'report_b': 'Report B',
+                                     'co_citing_papers': 'Papers Citing Both', 'jaccard': 'Overlap (Jaccard)'})
+    tab1, tab2 = st.tabs(["Top Pairs", "Heatmap"])
+    with tab1:
+        st.dataframe(pairs_df, use_container_width=True, height=400)
+        st.download_button("📥 Download Co-citation Pairs (CSV)", data=pairs_df.to_csv(index=False, encoding='utf-8-sig'),
+                           file_name="cocitation_pairs.csv", mime="text/csv", key=f"cocitation_download_{key}")
+    with tab2:
+        # 取被引论文数最多、且与其他报告有共被引的报告
+        cocitation = cocitation_data['cocitation']
+        cited = cocitation.diagonal()
+        co_cited = np.asarray((cocitation > 0).sum(axis=1)).ravel() > 1
+        top = [i for i in np.argsort(-cited, kind='stable') if co_cited[i]][:heatmap_size]
+        matrix = cocitation[top][:, top].toarray()
+        np.fill_diagonal(matrix, 0)
+        titles = cocitation_data['report_titles']
+        labels = [f"{n}. {titles[i][:40]}" for n, i in enumerate(top, 1)]
+        fig = px.imshow(matrix, x=labels, y=labels, color_continuous_scale='Blues',
+                        labels={'color': 'Papers citing both'}, title=f'Co-citation Heatmap (Top {len(top)} Reports)')
+        fig.update_layout(height=700, paper_bgcolor='white', font=dict(family="Arial, sans-serif"))
+        st.plotly_chart(fig, use_container_width=True)
+
+def citation_list_frame(matches, corpus, regions_df=None):
+    """单个报告的引用明细表（完整标题和引用文本），用于显示和导出"""
+    # 匹配表只有行号，这里才从语料库读取文本
+    import numpy as np
+    import pandas as pd
+    from citation_search_engine import match_frame
+    match_df = match_frame(matches, corpus)
+    enriched = enrich_matches_with_regions_data(match_df, regions_df)
+    return pd.DataFrame({
+        'No.': np.arange(1, len(match_df) + 1),
+        'Citing Paper Title': match_df['citing_paper'],
+        'First Author': enriched['first_author'],
+        'Year': enriched['year'],
+        'Source Title': enriched['source_title'],
+        'DOI': enriched['doi'],
+        'Cited By': enriched['cited_by'],
+        'Country': enriched['country'],
+        'Reference Text': match_df['reference_text'],
+        'Similarity': match_df['similarity_score'].map('{:.1f}%'.format),
+        'Match Method': match_df['match_method'].astype(str).map(lambda m: MATCH_METHOD_LABELS.get(m, m))
+    })
 
-def display_search_results(result, regions_df=None):
+def display_search_results(result, corpus, regions_df=None):
+    import pandas as pd
+    from citation_search_engine import matches_to_table, count_exact_citations
     st.markdown("---")
-    exact_citations = sum(1 for m in result['matches'] if m['similarity_score'] == 100.0)
+    exact_citations = count_exact_citations(result['matches'])
     potential_similar = result['citation_count'] - exact_citations
     total_possible = result['citation_count']
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("✅ Exact Citation", exact_citations, help="Citations with 100% similarity score")
+        st.metric("✅ Exact Citation", exact_citations,
+                  help="Citations that contain the full report title or its DOI/URL")
     with col2:
-        st.metric("🔍 Potential Similar", potential_similar, help="Citations with similarity score < 100%")
+        st.metric("🔍 Potential Similar", potential_similar, help="Fuzzy and word-overlap matches")
     with col3:
         st.metric("📊 Total Citations", total_possible, help="Total citations found as of September 2025")
     
-    if result['matches']:
+    if len(result['matches']):
         st.markdown("### 📋 Citing Papers")
-        enriched_matches = enrich_matches_with_regions_data(result['matches'], regions_df)
-        
-        # 创建显示用的DataFrame（带省略号）
-        display_df = pd.DataFrame([{
-            'No.': i + 1,
-            'Citing Paper Title': m['citing_paper'][:100] + '...' if len(m['citing_paper']) > 100 else m['citing_paper'],
-            'First Author': m.get('first_author', 'N/A'),
-            'Year': m.get('year', 'N/A'),
-            'Source Title': m.get('source_title', 'N/A'),
-            'DOI': m.get('doi', 'N/A'),
-            'Cited By': m.get('cited_by', 'N/A'),
-            'Country': m.get('country', 'N/A'),
-            'Reference Text': m['reference_text'][:150] + '...' if len(m['reference_text']) > 150 else m['reference_text'],
-            'Similarity': f"{m['similarity_score']:.1f}%",
-            'Match Method': m['match_method']
-        } for i, m in enumerate(enriched_matches)])
-        
+        # 显示用的DataFrame（长文本带省略号）；下载文件在点击时才生成
+        citation_df = citation_list_frame(result['matches'], corpus, regions_df)
+        display_df = citation_df.assign(**{
+            col: citation_df[col].map(lambda x, width=width: x[:width] + '...' if len(x) > width else x)
+            for col, width in (('Citing Paper Title', 100), ('Reference Text', 150))
+        })
         st.dataframe(display_df, use_container_width=True, height=400)
         
-        # 创建下载用的DataFrame（完整标题，无省略号）
-        download_df = pd.DataFrame([{
-            'No.': i + 1,
-            'Citing Paper Title': m['citing_paper'],  # 完整标题
-            'First Author': m.get('first_author', 'N/A'),
-            'Year': m.get('year', 'N/A'),
-            'Source Title': m.get('source_title', 'N/A'),
-            'DOI': m.get('doi', 'N/A'),
-            'Cited By': m.get('cited_by', 'N/A'),
-            'Country': m.get('country', 'N/A'),
-            'Reference Text': m['reference_text'],  # 完整引用文本
-            'Similarity': f"{m['similarity_score']:.1f}%",
-            'Match Method': m['match_method']
-        } for i, m in enumerate(enriched_matches)])
-        
-        csv = download_df.to_csv(index=False, encoding='utf-8-sig')
-        
         # 生成安全的文件名（移除特殊字符）
         safe_report_title = re.sub(r'[^\w\s-]', '', result['report_title'])[:50]
-        st.download_button(
-            "📥 Download Citation List (CSV)", 
-            data=csv, 
-            file_name=f"citations_{safe_report_title}.csv", 
-            mime="text/csv"
-        )
+        display_export_buttons("Download Citation List", results_fingerprint(corpus, [result]),
+                               lambda: citation_list_frame(result['matches'], corpus, regions_df),
+                               f"citations_{safe_report_title}", key="citation_list")
         
         if result['match_methods']:
+            import plotly.express as px
             st.markdown("### 📊 Match Method Distribution")
             method_df = pd.DataFrame([{'Match Method': k, 'Count': v} for k, v in result['match_methods'].items()])
-            method_labels = {'exact_substring': 'Exact Match', 'fuzzy_match': 'Fuzzy Match', 'word_overlap': 'Word Overlap'}
-            method_df['Match Method'] = method_df['Match Method'].map(method_labels)
+            method_df['Match Method'] = method_df['Match Method'].map(MATCH_METHOD_LABELS)
             fig = px.bar(method_df, x='Match Method', y='Count', title='Citation Count by Match Method', color='Match Method',
-                        color_discrete_sequence=['#009edb', '#56c02b', '#f9c642'])
+                        color_discrete_sequence=['#009edb', '#56c02b', '#f9c642', '#00689d'])
             fig.update_layout(plot_bgcolor='white', paper_bgcolor='white', font=dict(family="Arial, sans-serif"))
             st.plotly_chart(fig, use_container_width=True)
+        
+        aggregates = compute_match_aggregates(matches_to_table(result['matches']), regions_df)
+        if aggregates:
+            display_match_aggregates(aggregates)
     else:
         st.info("No citations found for this report in the selected database")
     display_disclaimer()
 
+def find_papers_by_title_or_doi(df, query, limit=50):
+    """按DOI（完全一致）或标题片段（不区分大小写）查找regions数据中的论文，返回行号"""
+    import numpy as np
+    from citation_search_engine import normalize_doi
+    if df is None or not query.strip():
+        return np.zeros(0, dtype=np.int64)
+    doi = normalize_doi(query)
+    doi_col = next((c for c in df.columns if c.strip().lower() == 'doi'), None)
+    if doi and doi_col is not None:
+        rows = np.flatnonzero((df[doi_col].fillna('').astype(str).str.strip().str.lower() == doi).to_numpy())
+        if len(rows):
+            return rows[:limit]
+    title_mask = df['Title_normalized'].str.contains(query.strip().lower(), regex=False, na=False)
+    return np.flatnonzero(title_mask.to_numpy())[:limit]
+
+def cited_reports_frame(results, corpus):
+    """反向查找结果的明细表（每行一条匹配），用于显示和导出"""
+    import pandas as pd
+    from citation_search_engine import match_frame
+    match_df = pd.concat([match_frame(r['matches'], corpus).assign(report_title=r['report_title']) for r in results],
+                         ignore_index=True)
+    return pd.DataFrame({
+        'Report Title': match_df['report_title'],
+        'Citing Paper Title': match_df['citing_paper'],
+        'Reference Text': match_df['reference_text'],
+        'Similarity': match_df['similarity_score'].map('{:.1f}%'.format),
+        'Match Method': match_df['match_method'].astype(str).map(lambda m: MATCH_METHOD_LABELS.get(m, m))
+    })
+
+def display_cited_reports(results, corpus, paper_count):
+    """显示反向查找结果：所选论文引用了哪些报告"""
+    st.markdown("---")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("📄 Selected Papers", paper_count)
+    with col2:
+        st.metric("📚 Reports Cited", len(results), help="Reports from the current list cited by the selected papers")
+    
+    if not results:
+        st.info("None of the reports in the current list are cited by the selected papers")
+        return
+    
+    cited_df = cited_reports_frame(results, corpus)
+    display_df = cited_df.assign(**{
+        col: cited_df[col].map(lambda x, width=width: x[:width] + '...' if len(x) > width else x)
+        for col, width in (('Report Title', 80), ('Citing Paper Title', 80), ('Reference Text', 150))
+    })
+    
+    st.markdown("### 📋 Cited Reports")
+    st.dataframe(display_df, use_container_width=True, height=400)
+    display_export_buttons("Download Cited Reports", results_fingerprint(corpus, results),
+                           lambda: cited_reports_frame(results, corpus), "cited_reports", key="cited_reports")
+    display_disclaimer()
+
 def display_keyword_filter_info():
-    if 'filtered_regions_df' in st.session_state and st.session_state['filtered_regions_df'] is not None:
+    if st.session_state.get('filtered_regions_mask') is not None:
         info = st.session_state.get('keyword_search_info', {})
         operator_display = info.get('operator', 'N/A')
         if operator_display == 'PHRASE':
@@ -655,9 +1088,62 @@ def display_keyword_filter_info():
         <strong>Filtered Papers:</strong> {info.get('result_count', 0):,} papers<br>
         <em>You can choose to limit citation search to these filtered papers below.</em></div>""", unsafe_allow_html=True)
 
+def display_leaderboard(leaderboard, report_titles, threshold):
+    import pandas as pd
+    import plotly.express as px
+    entries = {e['report_title']: e for e in leaderboard['reports']}
+    available_titles = [t for t in report_titles if t in entries]
+    
+    st.markdown("### 🏆 Full Catalogue Leaderboard")
+    st.caption(f"Precomputed on {leaderboard['generated_at'][:10]} for {len(available_titles):,} reports "
+               f"at similarity threshold {leaderboard['threshold']}")
+    if leaderboard['threshold'] != threshold:
+        st.info(f"ℹ️ The leaderboard was computed at threshold {leaderboard['threshold']}. "
+                f"Use the live batch search below for threshold {threshold}.")
+    
+    leaderboard_df = pd.DataFrame([{
+        'Report Name': t[:60] + '...' if len(t) > 60 else t,
+        'Exact Citations': entries[t]['exact_citations'],
+        'Total Citations': entries[t]['citation_count'],
+        **{label: entries[t]['match_methods'].get(method, 0) for method, label in MATCH_METHOD_LABELS.items()}
+    } for t in available_titles]).sort_values('Exact Citations', ascending=False)
+    
+    st.dataframe(leaderboard_df, use_container_width=True, height=400)
+    st.download_button("📥 Download Leaderboard (CSV)", data=leaderboard_df.to_csv(index=False, encoding='utf-8-sig'),
+                       file_name="citation_leaderboard.csv", mime="text/csv")
+    
+    ranked_titles = sorted(available_titles, key=lambda t: entries[t]['exact_citations'], reverse=True)
+    breakdown_title = st.selectbox("View citation breakdown for a report", options=[""] + ranked_titles)
+    if breakdown_title:
+        entry = entries[breakdown_title]
+        col1, col2 = st.columns(2)
+        with col1:
+            year_df = pd.DataFrame(sorted(entry['by_year'].items()), columns=['Year', 'Citations'])
+            if not year_df.empty:
+                fig = px.bar(year_df, x='Year', y='Citations', title='Citations by Year of Citing Paper',
+                             color_discrete_sequence=['#009edb'])
+                fig.update_layout(plot_bgcolor='white', paper_bgcolor='white', font=dict(family="Arial, sans-serif"))
+                st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            country_df = pd.DataFrame(list(entry['by_country'].items())[:15], columns=['Country', 'Citations'])
+            if not country_df.empty:
+                fig = px.bar(country_df, x='Citations', y='Country', orientation='h',
+                             title='Top Countries (First Author)', color_discrete_sequence=['#56c02b'])
+                fig.update_layout(plot_bgcolor='white', paper_bgcolor='white', font=dict(family="Arial, sans-serif"),
+                                  yaxis=dict(autorange='reversed'))
+                st.plotly_chart(fig, use_container_width=True)
+    
+    # 旧版排行榜文件没有保存引用论文ID
+    if available_titles and all('paper_ids' in entries[t] for t in available_titles):
+        display_cocitation({t: tuple(entries[t]['paper_ids']) for t in available_titles}, key="leaderboard")
+
 def main():
-    if 'filtered_regions_df' not in st.session_state:
-        st.session_state['filtered_regions_df'] = None
+    # 每次运行都确保预热已启动（默认选项"上传报告列表"在加载数据前就会返回，预热不能依赖后面的等待）
+    start_warm_up()
+    
+    # 关键词筛选结果只保存与regions数据对齐的布尔掩码
+    if 'filtered_regions_mask' not in st.session_state:
+        st.session_state['filtered_regions_mask'] = None
     if 'keyword_query' not in st.session_state:
         st.session_state['keyword_query'] = ''
     
@@ -666,13 +1152,12 @@ def main():
     st.markdown('<p class="subtitle">Analyze academic citations of UNEP FI reports in Scopus-indexed literature</p>', unsafe_allow_html=True)
     st.markdown("---")
     
-    regions_df = load_reference_regions_data()
-    
+    # 先渲染侧边栏，数据在需要时才加载
     with st.sidebar:
         st.header("📁 Data Configuration")
         import glob
-        default_scopus = "Complete_References_Scopus_FULL.csv"
-        default_unep = "UNEP FI Reports Title.csv"
+        default_scopus = DEFAULT_SCOPUS_FILE
+        default_unep = DEFAULT_REPORTS_FILE
         
         def find_file(filename):
             if os.path.exists(filename):
@@ -684,6 +1169,10 @@ def main():
             return len(matches) > 0
         
         has_default_scopus = find_file(default_scopus)
+        # 没有单独的Scopus长表文件时，直接使用regions数据中的 References 列
+        if not has_default_scopus and os.path.exists(REGIONS_FILE):
+            default_scopus = REGIONS_FILE
+            has_default_scopus = True
         has_default_unep = find_file(default_unep)
         
         st.subheader("1️⃣ Scopus Citation Data")
@@ -713,7 +1202,7 @@ def main():
         
         st.markdown("---")
         st.subheader("⚙️ Search Parameters")
-        threshold = st.slider("Similarity Threshold", min_value=70, max_value=100, value=85, step=5,
+        threshold = st.slider("Similarity Threshold", min_value=THRESHOLD_SLIDER_MIN, max_value=100, value=85, step=5,
                             help="Minimum similarity score for matching citations (higher = stricter)")
         
         st.markdown("---")
@@ -747,19 +1236,37 @@ def main():
         """)
         return
     
+    # 数据配置完成后才导入搜索引擎和数据处理库，只渲染侧边栏时不加载它们
+    import numpy as np
+    import pandas as pd
+    from citation_search_engine import (
+        MATCHING_VERSION,
+        MATCH_MODES,
+        apply_threshold,
+        search_multiple_reports,
+        prune_checkpoints,
+        find_cited_reports,
+        select_rows_by_paper_ids,
+        count_exact_citations
+    )
+    
+    wait_for_warm_up()
+    regions_df = load_reference_regions_data()
     try:
         with st.spinner("Loading data files..."):
             if isinstance(scopus_file, str):
-                scopus_df = pd.read_csv(scopus_file)
+                scopus_corpus, store_path = load_preloaded_corpus(scopus_file)
             else:
-                scopus_df = pd.read_csv(scopus_file)
+                scopus_corpus, store_path = load_uploaded_corpus(scopus_file, regions_df), None
+            # 报告列表第一列为标题，可选 DOI / URL 列用于精确匹配
             if isinstance(unep_file, str):
-                unep_titles = pd.read_csv(unep_file).iloc[:, 0].dropna().tolist()
+                unep_titles, report_metadata = load_preloaded_report_list(unep_file, os.path.getmtime(unep_file))
                 list_source = "pre-loaded UNEP FI list"
             else:
-                unep_titles = pd.read_csv(unep_file).iloc[:, 0].dropna().tolist()
+                unep_titles, report_metadata = load_uploaded_report_list(uploaded_file_hash(unep_file),
+                                                                         unep_file.getvalue())
                 list_source = "your custom list"
-        st.success(f"✅ Data loaded successfully | Scopus: {len(scopus_df):,} citations | Reports: {len(unep_titles)} from {list_source}")
+        st.success(f"✅ Data loaded successfully | Scopus: {scopus_corpus['size']:,} citations | Reports: {len(unep_titles)} from {list_source}")
     except Exception as e:
         st.error(f"❌ Data loading failed: {str(e)}")
         return
@@ -797,19 +1304,20 @@ def main():
         if apply_filter_button and keyword_input.strip():
             with st.spinner("Filtering papers by keywords..."):
                 try:
-                    filtered_df = search_papers_by_keywords(regions_df, keyword_input)
-                    st.session_state['filtered_regions_df'] = filtered_df
+                    filtered_mask = search_papers_by_keywords(regions_df, keyword_input, store_path)
+                    filtered_rows = np.flatnonzero(filtered_mask)
+                    st.session_state['filtered_regions_mask'] = filtered_mask
                     st.session_state['keyword_query'] = keyword_input
-                    if not filtered_df.empty:
-                        st.success(f"✅ Found {len(filtered_df):,} papers matching your keywords")
+                    if len(filtered_rows) > 0:
+                        st.success(f"✅ Found {len(filtered_rows):,} papers matching your keywords")
                         
                         # 显示筛选结果预览
-                        with st.expander("📋 View Filtered Papers (Preview - First 100 of {0:,} total)".format(len(filtered_df)), expanded=True):
-                            st.markdown(f"**Total papers found:** {len(filtered_df):,}")
+                        with st.expander("📋 View Filtered Papers (Preview - First 100 of {0:,} total)".format(len(filtered_rows)), expanded=True):
+                            st.markdown(f"**Total papers found:** {len(filtered_rows):,}")
                             st.markdown("**Showing preview of first 100 papers** (download CSV for complete list)")
                             st.markdown("---")
                             
-                            preview_df = filtered_df.head(100).copy()
+                            preview_df = regions_df.iloc[filtered_rows[:100]]
                             display_cols = []
                             col_name_mapping = {
                                 'Title': 'Title',
@@ -846,36 +1354,36 @@ def main():
                                 with col1:
                                     st.metric("📄 Papers in Preview", len(display_df))
                                 with col2:
-                                    st.metric("📊 Total Filtered Papers", len(filtered_df))
+                                    st.metric("📊 Total Filtered Papers", len(filtered_rows))
                                 
-                                # 下载完整列表
-                                full_download_df = filtered_df[display_cols].copy()
-                                full_download_df = full_download_df.rename(columns=rename_dict)
-                                full_download_df.insert(0, 'No.', range(1, len(full_download_df) + 1))
+                                # 下载完整列表（点击时才生成）
+                                def build_filtered_papers(rows=filtered_rows, cols=display_cols, names=rename_dict):
+                                    full_download_df = regions_df.iloc[rows][cols].rename(columns=names)
+                                    full_download_df.insert(0, 'No.', range(1, len(full_download_df) + 1))
+                                    return full_download_df
                                 
-                                st.download_button(
-                                    "📥 Download Complete Filtered Papers List (CSV)",
-                                    data=full_download_df.to_csv(index=False, encoding='utf-8-sig'),
-                                    file_name=f"filtered_papers_{len(filtered_df)}_papers.csv",
-                                    mime="text/csv",
-                                    use_container_width=True
-                                )
+                                filter_fingerprint = hashlib.sha256(
+                                    keyword_input.encode('utf-8') + filtered_rows.tobytes()).hexdigest()
+                                display_export_buttons("Download Complete Filtered Papers List", filter_fingerprint,
+                                                       build_filtered_papers,
+                                                       f"filtered_papers_{len(filtered_rows)}_papers",
+                                                       key="filtered_papers")
                             else:
                                 st.warning("⚠️ Could not find expected columns in the data")
                     else:
                         st.warning("⚠️ No papers found matching your keywords. Please try different search terms.")
-                        st.session_state['filtered_regions_df'] = None
+                        st.session_state['filtered_regions_mask'] = None
                 except Exception as e:
                     st.error(f"❌ Keyword search error: {str(e)}")
         
         if reset_filter_button:
-            st.session_state['filtered_regions_df'] = None
+            st.session_state['filtered_regions_mask'] = None
             st.session_state['keyword_query'] = ''
             st.session_state['keyword_search_info'] = {}
             st.success("✅ Filter reset successfully")
             st.rerun()
         
-        if st.session_state['filtered_regions_df'] is not None:
+        if st.session_state['filtered_regions_mask'] is not None:
             display_keyword_filter_info()
     else:
         st.info("ℹ️ 'all reference with regions.csv' not found. Keywords Search feature is unavailable.")
@@ -889,11 +1397,12 @@ def main():
     Select whether to search citations across all available papers or limit to your filtered keyword results.
     </div>""", unsafe_allow_html=True)
     
-    active_regions_df = st.session_state.get('filtered_regions_df', regions_df)
-    has_filtered_data = st.session_state.get('filtered_regions_df') is not None
+    filtered_mask = st.session_state.get('filtered_regions_mask')
+    # 掩码必须与当前regions数据对齐（数据文件更新后旧掩码失效）
+    has_filtered_data = filtered_mask is not None and regions_df is not None and len(filtered_mask) == len(regions_df)
     
     if has_filtered_data:
-        filtered_count = len(st.session_state['filtered_regions_df'])
+        filtered_count = int(filtered_mask.sum())
         total_count = len(regions_df) if regions_df is not None else 0
         
         database_option = st.radio(
@@ -907,29 +1416,22 @@ def main():
         )
         
         if "Filtered Database" in database_option:
-            filtered_titles = set(st.session_state['filtered_regions_df']['Title_normalized'].unique())
-            scopus_title_col = None
-            for col in scopus_df.columns:
-                if col.strip().lower() == 'title':
-                    scopus_title_col = col
-                    break
-            if scopus_title_col:
-                active_scopus_df = scopus_df[scopus_df[scopus_title_col].str.strip().str.lower().isin(filtered_titles)].copy()
-                st.success(f"✅ **Filtered Database Selected**: Citation search limited to {filtered_count:,} filtered papers")
-                st.info(f"ℹ️ Citations will only be counted if they appear in these {filtered_count:,} filtered papers. This allows for domain-specific impact analysis.")
-            else:
-                st.error("❌ Could not locate 'Title' column in Scopus data. Defaulting to full database.")
-                active_scopus_df = scopus_df
+            # 筛选视图只保存行号，不复制Scopus数据
+            filtered_paper_ids = regions_df['paper_id'].to_numpy()[filtered_mask]
+            active_row_ids = select_rows_by_paper_ids(scopus_corpus, filtered_paper_ids)
+            st.success(f"✅ **Filtered Database Selected**: Citation search limited to {filtered_count:,} filtered papers")
+            st.info(f"ℹ️ Citations will only be counted if they appear in these {filtered_count:,} filtered papers. This allows for domain-specific impact analysis.")
         else:
-            active_scopus_df = scopus_df
+            active_row_ids = None
             st.success(f"✅ **Full Database Selected**: Searching across all {total_count:,} available papers")
     else:
         st.info("ℹ️ **Full database mode**: No keyword filter applied. Use Keywords Search above to enable filtered database option.")
-        active_scopus_df = scopus_df
+        active_row_ids = None
     
     st.markdown("---")
     
-    search_mode = st.radio("**Search Mode**", ["🔍 Single Report Search", "📊 Batch Report Search"], horizontal=True)
+    search_mode = st.radio("**Search Mode**", ["🔍 Single Report Search", "📊 Batch Report Search", "📄 Paper Lookup"],
+                           horizontal=True)
     
     if search_mode == "🔍 Single Report Search":
         st.markdown("### 🔍 Single Report Search")
@@ -946,50 +1448,153 @@ def main():
             search_button = st.button("🚀 Search Citations", type="primary", use_container_width=True)
         
         if search_button and report_title:
-            with st.spinner(f"Searching citations for '{report_title[:50]}...'"):
-                try:
-                    result = search_single_report(report_title, active_scopus_df, threshold)
-                    display_search_results(result, active_regions_df)
-                except Exception as e:
-                    st.error(f"❌ Search error: {str(e)}")
+            st.session_state['single_search_title'] = report_title
         elif search_button and not report_title:
+            st.session_state.pop('single_search_title', None)
             st.warning("⚠️ Please select or enter a report title")
+        
+        # 保留最近一次搜索：调整阈值滑块时只重新筛选缓存的评分表
+        searched_title = st.session_state.get('single_search_title')
+        if searched_title:
+            progress_bar = st.empty()
+            scan = {}
+            
+            def scan_callback(progress):
+                scan.update(progress)
+                progress_bar.progress(progress['rows_scanned'] / max(progress['rows_total'], 1),
+                                      text=format_scan_progress(progress))
+            
+            try:
+                score_table = get_report_score_table(searched_title, report_metadata.get(searched_title),
+                                                     scopus_corpus, active_row_ids, threshold, scan_callback)
+                progress_bar.empty()
+                result = apply_threshold(score_table, scopus_corpus, threshold)
+                caption = f"Results for **{searched_title}** at similarity threshold {threshold}"
+                if scan:
+                    # 只在实际扫描（未命中缓存）时显示，便于发现性能退化
+                    caption += (f" · scanned {scan['rows_total']:,} references in "
+                                f"{format_duration(scan['elapsed_seconds'])} ({scan['rows_per_second']:,.0f} refs/s)")
+                st.caption(caption)
+                display_search_results(result, scopus_corpus, regions_df)
+            except Exception as e:
+                progress_bar.empty()
+                st.error(f"❌ Search error: {str(e)}")
+    
+    elif search_mode == "📄 Paper Lookup":
+        # 反向查找：从论文出发，只比较该论文自己的引用与全部报告标题
+        st.markdown("### 📄 Paper Lookup")
+        st.caption("Find which reports in the current list are cited by specific papers")
+        if regions_df is None or regions_df.empty:
+            st.info("ℹ️ Paper lookup requires 'all reference with regions.csv'")
+            return
+        
+        paper_query = st.text_input("Enter a paper title or DOI", placeholder="e.g., 10.1016/j.jclepro... or part of a title")
+        candidate_rows = find_papers_by_title_or_doi(regions_df, paper_query)
+        if paper_query and len(candidate_rows) == 0:
+            st.warning("⚠️ No matching papers found")
+        selected_rows = st.multiselect("Select citing papers", options=candidate_rows.tolist(),
+                                       format_func=lambda i: str(regions_df['Title'].iloc[i])[:120])
+        lookup_button = st.button("🔎 Find Cited Reports", type="primary")
+        
+        if lookup_button and selected_rows:
+            st.session_state['paper_lookup_ids'] = regions_df['paper_id'].to_numpy()[selected_rows].tolist()
+        elif lookup_button:
+            st.session_state.pop('paper_lookup_ids', None)
+            st.warning("⚠️ Please select at least one paper")
+        
+        lookup_ids = st.session_state.get('paper_lookup_ids')
+        if lookup_ids:
+            with st.spinner("Matching the selected papers' references against all reports..."):
+                try:
+                    results = find_cited_reports(lookup_ids, unep_titles, scopus_corpus, threshold, report_metadata)
+                    display_cited_reports(results, scopus_corpus, len(lookup_ids))
+                except Exception as e:
+                    st.error(f"❌ Lookup error: {str(e)}")
     
     else:
+        # 预置报告列表 + 预置全库：直接显示预计算排行榜，自定义列表才需要实时搜索
+        leaderboard = None
+        if isinstance(scopus_file, str) and isinstance(unep_file, str) and active_row_ids is None \
+                and os.path.exists(LEADERBOARD_FILE):
+            leaderboard = load_citation_leaderboard(LEADERBOARD_FILE, os.path.getmtime(LEADERBOARD_FILE))
+            # 排行榜由全量扫描生成，与数据本身的指纹比较（SQLite 存储语料库另有 'data_fingerprint'）
+            data_fingerprint = scopus_corpus.get('data_fingerprint', scopus_corpus['fingerprint'])
+            if leaderboard is not None and (leaderboard.get('corpus_fingerprint') != data_fingerprint
+                                            or leaderboard.get('matching_version') != MATCHING_VERSION):
+                st.warning("⚠️ The precomputed leaderboard is out of date with the Scopus data or matching rules. "
+                           "Run `python build_leaderboard.py` to refresh it.")
+                leaderboard = None
+        if leaderboard is not None:
+            display_leaderboard(leaderboard, unep_titles, threshold)
+            st.markdown("---")
+        
         st.markdown("### 📊 Batch Report Search")
         selected_reports = st.multiselect("Select multiple reports for batch analysis", options=unep_titles,
                                          help="You can select multiple reports to analyze simultaneously")
-        col1, col2 = st.columns([1, 4])
+        # 汇总表只统计精确引用（直接包含或DOI/URL，各模式结果相同），默认只做直接包含匹配
+        match_mode = st.radio("Match mode", MATCH_MODES, format_func=MATCH_MODE_LABELS.get, horizontal=True,
+                              help="Exact only is enough for the summary table (exact citations); "
+                                   "the other modes also find approximate matches but take much longer")
+        if selected_reports:
+            estimate = get_search_cost_estimate(tuple(selected_reports), match_mode, scopus_corpus['fingerprint'],
+                                                active_row_ids, scopus_corpus)
+            st.caption(f"Estimated time: up to ~{format_duration(estimate['seconds'])} "
+                       f"for {estimate['comparisons']:,} title/reference comparisons")
+        col1, col2, col3 = st.columns([1, 1, 3])
         with col1:
             batch_search_button = st.button("🚀 Start Batch Search", type="primary", use_container_width=True)
+        with col2:
+            quick_count_button = st.button("⚡ Quick Count", use_container_width=True,
+                                           help="Estimate citation counts from a growing sample of references; "
+                                                "the table refines as more of the corpus is scanned")
+        
+        if quick_count_button and selected_reports:
+            display_quick_count(selected_reports, scopus_corpus, threshold, active_row_ids, report_metadata,
+                                match_mode)
         
         if batch_search_button and selected_reports:
             progress_bar = st.progress(0)
             status_text = st.empty()
             results = []
             
+            completed_reports = 0
+            
             def progress_callback(current, total, result):
+                nonlocal completed_reports
+                completed_reports = current
                 progress = current / total
                 progress_bar.progress(progress)
                 status_text.text(f"Processing: {current}/{total} - {result['report_title'][:50]}...")
             
+            def scan_callback(progress):
+                # 报告内按扫描行数推进，进度条不再只在报告完成时跳动
+                fraction = progress['rows_scanned'] / max(progress['rows_total'], 1)
+                progress_bar.progress(min((completed_reports + fraction) / len(selected_reports), 1.0))
+                status_text.text(f"Processing: {completed_reports + 1}/{len(selected_reports)} - "
+                                 f"{progress['report_title'][:50]}... {format_scan_progress(progress)}")
+            
             try:
+                prune_checkpoints(CHECKPOINT_DIR, 'batch', CHECKPOINT_MAX_BYTES, CHECKPOINT_MAX_AGE_SECONDS)
                 with st.spinner("Running batch search..."):
-                    results = search_multiple_reports(selected_reports, active_scopus_df, threshold, progress_callback)
+                    results = search_multiple_reports(selected_reports, scopus_corpus, threshold, progress_callback,
+                                                      row_ids=active_row_ids, report_metadata=report_metadata,
+                                                      match_mode=match_mode, checkpoint_dir=CHECKPOINT_DIR,
+                                                      scan_callback=scan_callback)
                 progress_bar.empty()
                 status_text.empty()
                 
                 st.markdown("### 📊 Batch Search Results")
                 summary_df = pd.DataFrame([{
                     'Report Name': r['report_title'][:60] + '...' if len(r['report_title']) > 60 else r['report_title'],
-                    'Exact Citations (100% Similarity)': sum(1 for m in r['matches'] if m['similarity_score'] == 100.0)
-                } for r in results]).sort_values('Exact Citations (100% Similarity)', ascending=False)
+                    'Exact Citations': count_exact_citations(r['matches'])
+                } for r in results]).sort_values('Exact Citations', ascending=False)
                 
                 st.dataframe(summary_df, use_container_width=True)
                 
-                fig = px.bar(summary_df.head(20), x='Exact Citations (100% Similarity)', y='Report Name',
-                           orientation='h', title='Top 20 Reports by Citation Count',
-                           labels={'Exact Citations (100% Similarity)': 'Citation Count', 'Report Name': 'Report'},
+                import plotly.express as px
+                fig = px.bar(summary_df.head(20), x='Exact Citations', y='Report Name',
+                           orientation='h', title='Top 20 Reports by Exact Citations',
+                           labels={'Report Name': 'Report'},
                            color_discrete_sequence=['#009edb'])
                 fig.update_layout(height=600, plot_bgcolor='white', paper_bgcolor='white',
                                 font=dict(family="Arial, sans-serif"))
@@ -998,10 +1603,13 @@ def main():
                 csv = summary_df.to_csv(index=False, encoding='utf-8-sig')
                 st.download_button("📥 Download Summary Report (CSV)", data=csv,
                                  file_name="batch_citation_summary.csv", mime="text/csv")
+                if len(results) > 1:
+                    display_cocitation({r['report_title']: tuple(r['matches']['paper_id'].tolist()) for r in results},
+                                       key="batch")
                 display_disclaimer()
             except Exception as e:
                 st.error(f"❌ Batch search error: {str(e)}")
-        elif batch_search_button and not selected_reports:
+        elif (batch_search_button or quick_count_button) and not selected_reports:
             st.warning("⚠️ Please select at least one report for batch analysis")
 
 if __name__ == "__main__":
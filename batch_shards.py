@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+分片批量搜索脚本
+把报告列表确定性地分成 N 个分片，各分片作为独立进程（或共享文件系统的不同主机）运行，
+最后合并为与单机 search_multiple_reports 相同的结果。
+
+用法:
+    # 本机 4 个进程运行全部分片并合并
+    python batch_shards.py local --shards 4 --output batch_results.json
+
+    # 多台主机：每台运行一个分片，全部完成后任意一台合并
+    python batch_shards.py run --shard 1 --shards 4
+    python batch_shards.py merge --shards 4 --output batch_results.json
+
+所有命令必须使用相同的数据文件、报告列表、阈值和匹配模式；
+分片结果写入 --output-dir 下的检查点，中断后重新运行同一分片会继续。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from citation_search_engine import (
+    MATCH_MODES,
+    load_preloaded_data,
+    match_frame,
+    merge_batch_shards,
+    parse_report_list,
+    run_batch_shard
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="分片运行UNEP FI报告批量引用搜索")
+    parser.add_argument('command', choices=['run', 'merge', 'local'],
+                        help="run: 运行一个分片; merge: 合并全部分片; local: 本机多进程运行全部分片并合并")
+    parser.add_argument('--scopus', default="Complete_References_Scopus_FULL.csv", help="Scopus引用数据文件")
+    parser.add_argument('--regions', default="all reference with regions.csv", help="regions数据文件")
+    parser.add_argument('--reports', default="UNEP FI Reports Title.csv", help="报告列表文件")
+    parser.add_argument('--threshold', type=int, default=85, help="相似度阈值")
+    parser.add_argument('--match-mode', choices=MATCH_MODES, default='full', help="匹配模式")
+    parser.add_argument('--shards', type=int, required=True, help="分片数")
+    parser.add_argument('--shard', type=int, help="run 命令运行的分片编号（1 到 --shards）")
+    parser.add_argument('--workers', type=int, help="local 命令的进程数（默认等于分片数）")
+    parser.add_argument('--output-dir', default=".shards", help="分片结果目录（多主机时须在共享文件系统上）")
+    parser.add_argument('--output', default="batch_results.json", help="合并结果输出文件")
+    return parser.parse_args()
+
+
+def load_inputs(args):
+    """加载语料库和报告列表，返回 (corpus, report_titles, report_metadata)"""
+    corpus, _, _ = load_preloaded_data(args.scopus, args.regions)
+    report_titles, report_metadata = parse_report_list(pd.read_csv(args.reports))
+    return corpus, report_titles, report_metadata
+
+
+def run_shard(args, shard_index):
+    """在当前进程运行一个分片，返回完成的报告数"""
+    corpus, report_titles, report_metadata = load_inputs(args)
+    start = time.time()
+    label = f"{shard_index + 1}/{args.shards}"
+
+    def progress_callback(current, total, result):
+        elapsed = time.time() - start
+        print(f"[分片 {label}] [{current}/{total}] {elapsed:7.1f}s  {result['citation_count']:5d}  "
+              f"{result['report_title'][:50]}", flush=True)
+
+    results = run_batch_shard(report_titles, corpus, shard_index, args.shards, args.output_dir, args.threshold,
+                              progress_callback, report_metadata=report_metadata, match_mode=args.match_mode)
+    return len(results)
+
+
+def merge(args):
+    corpus, report_titles, report_metadata = load_inputs(args)
+    results = merge_batch_shards(report_titles, corpus, args.output_dir, args.shards, args.threshold,
+                                 report_metadata=report_metadata, match_mode=args.match_mode)
+    # 输出文件带完整的匹配明细（文本从语料库读取），脱离语料库也可以使用
+    records = [dict(result, matches=match_frame(result['matches'], corpus).to_dict('records')) for result in results]
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=1)
+    total = sum(result['citation_count'] for result in results)
+    print(f"✅ 已合并 {len(results)} 个报告（{total:,} 条引用）到 {args.output}")
+
+
+def main():
+    args = parse_args()
+
+    if args.shards < 1:
+        print("❌ --shards 必须至少为 1")
+        return 1
+    if not os.path.exists(args.reports):
+        print(f"❌ 文件不存在: {args.reports}")
+        return 1
+
+    try:
+        if args.command == 'run':
+            if args.shard is None or not 1 <= args.shard <= args.shards:
+                print(f"❌ run 命令需要 --shard（1 到 {args.shards}）")
+                return 1
+            count = run_shard(args, args.shard - 1)
+            print(f"✅ 分片 {args.shard}/{args.shards} 完成（{count} 个报告）")
+        elif args.command == 'local':
+            with ProcessPoolExecutor(max_workers=args.workers or args.shards) as executor:
+                counts = list(executor.map(run_shard, [args] * args.shards, range(args.shards)))
+            print(f"✅ {args.shards} 个分片完成（{sum(counts)} 个报告）")
+            merge(args)
+        else:
+            merge(args)
+    except FileNotFoundError as e:
+        print(f"❌ 文件不存在: {e.filename}")
+        return 1
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+应用冷启动基准
+每次测量都在全新的 Python 进程中进行：
+1. 导入 app 模块的耗时，并检查此时没有导入延迟加载的模块（pandas、numpy、thefuzz、
+   搜索引擎和存储模块、plotly.express、scipy），app 模块本身只依赖 streamlit 和标准库
+2. 在没有数据文件的空目录中首次运行 app.py（只渲染页面框架和侧边栏）的耗时；
+   这一项只检查运行脚本时新导入的模块（测试框架本身可能已导入它们）
+任一项超出预算、延迟加载的模块被提前导入或页面出错时退出码为 1，可在部署前运行。
+
+用法:
+    python benchmark_startup.py
+    python benchmark_startup.py --repeat 5 --import-budget 0.8 --render-budget 1
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# 只在对应视图中（或配置好数据之后）导入的模块，启动时不应出现在 sys.modules 中
+# （streamlit 自身会导入 plotly 的基础部分，但不会导入 plotly.express）
+DEFERRED_MODULES = ['plotly.express', 'scipy', 'pandas', 'numpy', 'thefuzz', 'citation_search_engine',
+                    'citation_store']
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'loaded': [m for m in %r if m in sys.modules]}))
+"""
+
+RENDER_PROBE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(%r, default_timeout=120)
+before = set(sys.modules)
+start = time.perf_counter()
+at.run()
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'loaded': [m for m in %r if m in sys.modules and m not in before],
+                  'errors': [str(e.value) for e in at.exception]}))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="测量应用冷启动耗时，超出预算时失败")
+    parser.add_argument('--repeat', type=int, default=3, help="每项测量的次数（取最小值）")
+    parser.add_argument('--import-budget', type=float, default=1.0, help="导入 app 模块的预算（秒）")
+    parser.add_argument('--render-budget', type=float, default=1.5, help="首次渲染页面的预算（秒）")
+    return parser.parse_args()
+
+
+def run_probe(code, cwd):
+    """在新进程中运行探测代码，返回其输出的JSON"""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [repo_dir, os.environ.get('PYTHONPATH')])))
+    completed = subprocess.run([sys.executable, '-c', code], cwd=cwd, env=env, capture_output=True, text=True,
+                               check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure(name, code, cwd, repeat, budget):
+    """重复测量一项，打印结果，返回是否通过"""
+    runs = [run_probe(code, cwd) for _ in range(repeat)]
+    seconds = min(run['seconds'] for run in runs)
+    loaded = sorted(set(m for run in runs for m in run['loaded']))
+    errors = sorted(set(e for run in runs for e in run.get('errors', [])))
+
+    passed = seconds <= budget and not loaded and not errors
+    print(f"{'✅' if passed else '❌'} {name}: {seconds:.2f}s（预算 {budget:.2f}s，{repeat} 次取最小）")
+    if loaded:
+        print(f"   提前导入了延迟加载的模块: {', '.join(loaded)}")
+    for error in errors:
+        print(f"   页面错误: {error}")
+    return passed
+
+
+def main():
+    args = parse_args()
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    app_path = os.path.join(repo_dir, 'app.py')
+
+    passed = measure("导入 app 模块", IMPORT_PROBE % (DEFERRED_MODULES,), repo_dir, args.repeat, args.import_budget)
+    with tempfile.TemporaryDirectory() as empty_dir:
+        passed &= measure("首次渲染", RENDER_PROBE % (app_path, DEFERRED_MODULES), empty_dir, args.repeat,
+                          args.render_budget)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
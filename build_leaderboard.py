@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+全目录引用排行榜预计算脚本
+对预置报告列表中的每个报告运行引用搜索，结果保存为JSON，应用直接加载。
+Scopus数据或报告列表更新后重新运行此脚本即可刷新排行榜。
+
+用法:
+    python build_leaderboard.py
+    python build_leaderboard.py --threshold 85 --output citation_leaderboard.json
+
+运行中断后用相同参数重新运行，会从检查点继续（已完成的报告不再搜索）。
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from citation_search_engine import (
+    build_citation_leaderboard,
+    load_preloaded_data,
+    parse_report_list,
+    save_leaderboard
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="预计算UNEP FI报告引用排行榜")
+    parser.add_argument('--scopus', default="Complete_References_Scopus_FULL.csv", help="Scopus引用数据文件")
+    parser.add_argument('--regions', default="all reference with regions.csv", help="regions数据文件")
+    parser.add_argument('--reports', default="UNEP FI Reports Title.csv", help="报告列表文件")
+    parser.add_argument('--threshold', type=int, default=85, help="相似度阈值")
+    parser.add_argument('--output', default="citation_leaderboard.json", help="排行榜输出文件")
+    parser.add_argument('--checkpoint-dir', default=".checkpoints", help="检查点目录（传入空字符串则不使用检查点）")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if not os.path.exists(args.reports):
+        print(f"❌ 文件不存在: {args.reports}")
+        return 1
+
+    print("加载数据...")
+    if not os.path.exists(args.scopus) and os.path.exists(args.regions):
+        print(f"ℹ️ 未找到 {args.scopus}，使用 {args.regions} 中的 References 列")
+    try:
+        corpus, regions_df, _ = load_preloaded_data(args.scopus, args.regions)
+    except FileNotFoundError as e:
+        print(f"❌ 文件不存在: {e.filename}")
+        return 1
+    report_titles, report_metadata = parse_report_list(pd.read_csv(args.reports))
+    print(f"Scopus: {corpus['size']:,} 条引用 | 报告: {len(report_titles)} 个")
+
+    start = time.time()
+
+    def progress_callback(current, total, result):
+        elapsed = time.time() - start
+        print(f"[{current}/{total}] {elapsed:7.1f}s  {result['citation_count']:5d}  {result['report_title'][:60]}")
+
+    leaderboard = build_citation_leaderboard(report_titles, corpus, regions_df, args.threshold, progress_callback,
+                                             report_metadata=report_metadata, checkpoint_dir=args.checkpoint_dir)
+    save_leaderboard(leaderboard, args.output)
+    print(f"✅ 排行榜已保存到 {args.output}（用时 {time.time() - start:.1f}s）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,7 +7,14 @@ import pandas as pd
 import numpy as np
 from thefuzz import fuzz
 from collections import Counter
+from datetime import datetime
+import hashlib
+import json
+import math
+import os
 import re
+import time
+from statistics import NormalDist
 
 
 def normalize_text(text):
@@ -33,24 +40,151 @@ def preprocess_titles(unep_titles):
     return processed_titles
 
 
-def check_match(reference_text, report_title, processed_data, threshold=85):
+# 匹配规则版本：匹配逻辑改变、结果可能不同时加一，使预计算结果失效
+MATCHING_VERSION = 3
+
+DOI_PATTERN = re.compile(r'10\.\d{4,9}/[^\s;,"<>]+', re.IGNORECASE)
+# Scopus 引用文本中的出版年份，形如 "(2017)"
+YEAR_PATTERN = re.compile(r'\((1[89]\d{2}|20\d{2})\)')
+# 年份剪枝的容差：预印本、在线优先发表等会使引用年份略早于正式出版年份
+YEAR_TOLERANCE = 1
+# 引用文本中不可能是标题的片段：年份、卷期页码等
+SPAN_YEAR_PATTERN = re.compile(r'^\(?\d{4}\)?$')
+# 作者姓、名片段的最多词数（更长的开头片段视为标题）
+AUTHOR_SEGMENT_MAX_WORDS = 5
+SPAN_NOISE_PATTERN = re.compile(r'^(\(?\d{4}\)?|\d+([-–]\d+)?|pp?\.\s*[\d\-–]+|(vol|no)\.?\s*\d+|art\.?\s*\w+)?$',
+                                re.IGNORECASE)
+URL_PATTERN = re.compile(r'(?:https?://|www\.)[^\s;,"<>]+|\bunepfi\.org/[^\s;,"<>]*', re.IGNORECASE)
+
+
+def normalize_doi(text):
+    """从文本中提取第一个DOI并标准化（小写、去掉末尾标点），没有则返回空字符串"""
+    if pd.isna(text):
+        return ""
+    found = DOI_PATTERN.search(str(text))
+    if not found:
+        return ""
+    return found.group(0).lower().rstrip('.)]')
+
+
+def normalize_url(text):
+    """标准化URL：小写，去掉协议、www. 和末尾的标点及斜杠"""
+    if pd.isna(text):
+        return ""
+    url = str(text).strip().lower()
+    url = re.sub(r'^https?://', '', url)
+    if url.startswith('www.'):
+        url = url[4:]
+    return url.rstrip('./)]')
+
+
+def extract_identifiers(reference_text):
     """
-    检查引用文本是否匹配报告标题
+    从原始引用文本中提取DOI和URL键（需在标准化之前进行，标准化会去掉标点）
+    
+    Returns:
+        set: 形如 'doi:10.xxx/yyy' 或 'url:unepfi.org/...' 的键
+    """
+    if pd.isna(reference_text):
+        return set()
+    text = str(reference_text)
+    keys = set()
+    if '10.' in text:
+        keys.update('doi:' + doi.lower().rstrip('.)]') for doi in DOI_PATTERN.findall(text))
+    if 'http' in text or 'www.' in text or 'unepfi.org' in text:
+        keys.update('url:' + normalize_url(url) for url in URL_PATTERN.findall(text))
+    return keys
+
+
+def parse_year(value):
+    """将年份值转换为整数（1800-2099），无法识别时返回None"""
+    if pd.isna(value):
+        return None
+    found = re.search(r'(1[89]\d{2}|20\d{2})', str(value))
+    return int(found.group(1)) if found else None
+
+
+def extract_reference_year(reference_text):
+    """提取引用文本中最后一个括号年份，没有则返回0（未知）"""
+    if pd.isna(reference_text):
+        return 0
+    years = YEAR_PATTERN.findall(str(reference_text))
+    return int(years[-1]) if years else 0
+
+
+def extract_title_span(reference_text):
+    """
+    从Scopus引用文本中提取最可能的标题片段（已标准化）
+    
+    Scopus 引用格式为：第一作者姓, 名, 标题, 期刊, 卷, 期, 页码, (年份)；报告类引用常为
+    机构, 标题, (年份)。去掉年份、卷期页码等片段后，跳过开头的作者姓名（两个短片段）
+    或机构，取其后的第一个片段。不是这两种格式时取第一个片段（标题, 期刊, ...）。
+    无法缩短时返回空字符串，表示直接使用完整引用文本。
+    """
+    if pd.isna(reference_text):
+        return ""
+    segments = [seg.strip() for seg in str(reference_text).split(', ')]
+    candidates = [seg for seg in segments if not SPAN_NOISE_PATTERN.match(seg)]
+    if len(candidates) < 2:
+        return ""
+    if len(candidates) >= 3:
+        authors = all(len(seg.split()) <= AUTHOR_SEGMENT_MAX_WORDS for seg in candidates[:2])
+        span = candidates[2] if authors else candidates[0]
+    else:
+        # 只去掉了年份时为 机构, 标题；带卷期页码的为 标题, 期刊
+        noise = [seg for seg in segments if SPAN_NOISE_PATTERN.match(seg)]
+        span = candidates[1] if all(SPAN_YEAR_PATTERN.match(seg) for seg in noise) else candidates[0]
+    return normalize_text(span)
+
+
+def report_identifier_keys(report_meta):
+    """报告元数据中的DOI/URL键，格式与 extract_identifiers 相同"""
+    if not report_meta:
+        return set()
+    keys = set()
+    doi = normalize_doi(report_meta.get('doi'))
+    if doi:
+        keys.add('doi:' + doi)
+    url = normalize_url(report_meta.get('url'))
+    if url:
+        keys.add('url:' + url)
+    return keys
+
+
+def parse_report_list(report_df):
+    """
+    解析报告列表：第一列为报告标题，可选 'DOI'、'URL'、'Year' 列
     
     Args:
-        reference_text: 引用文本
-        report_title: 报告标题
-        processed_data: 预处理的标题数据
-        threshold: 相似度阈值
+        report_df: 报告列表DataFrame
         
     Returns:
-        dict: 包含匹配信息的字典，如果不匹配则返回None
+        tuple: (标题列表, {标题: 元数据字典})，元数据只包含有值的字段
     """
-    if pd.isna(reference_text) or pd.isna(report_title):
-        return None
+    title_col = report_df.columns[0]
+    doi_col = _find_column(report_df, 'doi')
+    url_col = _find_column(report_df, 'url') or _find_column(report_df, 'link')
+    year_col = _find_column(report_df, 'year') or _find_column(report_df, 'publication year')
     
-    ref_normalized = normalize_text(reference_text)
-    title_data = processed_data[report_title]
+    titles = []
+    metadata = {}
+    for _, row in report_df[report_df[title_col].notna()].iterrows():
+        title = row[title_col]
+        titles.append(title)
+        meta = {}
+        if doi_col is not None and normalize_doi(row[doi_col]):
+            meta['doi'] = str(row[doi_col]).strip()
+        if url_col is not None and normalize_url(row[url_col]):
+            meta['url'] = str(row[url_col]).strip()
+        if year_col is not None and parse_year(row[year_col]):
+            meta['year'] = parse_year(row[year_col])
+        if meta:
+            metadata[title] = meta
+    return titles, metadata
+
+
+def _match_normalized(ref_normalized, title_data, threshold=85):
+    """对已标准化的引用文本执行三级匹配，供 check_match 和语料库搜索共用"""
     title_normalized = title_data['normalized']
     
     # Method 1: 直接字符串包含
@@ -69,10 +203,10 @@ def check_match(reference_text, report_title, processed_data, threshold=85):
         }
     
     # Method 3: 词语重叠匹配
-    ref_words = set(ref_normalized.split())
     title_words = title_data['words']
     
     if len(title_words) >= 3:
+        ref_words = set(ref_normalized.split())
         common_words = title_words & ref_words
         overlap_ratio = len(common_words) / len(title_words) * 100
         
@@ -85,22 +219,153 @@ def check_match(reference_text, report_title, processed_data, threshold=85):
     return None
 
 
-def search_single_report(report_title, scopus_df, threshold=85):
+def check_match(reference_text, report_title, processed_data, threshold=85):
     """
-    搜索单个报告的引用情况
+    检查引用文本是否匹配报告标题
     
     Args:
+        reference_text: 引用文本
         report_title: 报告标题
-        scopus_df: Scopus引用数据DataFrame (必须包含 'Title' 和 'Reference' 列)
+        processed_data: 预处理的标题数据
         threshold: 相似度阈值
         
     Returns:
-        dict: 包含引用信息的字典
+        dict: 包含匹配信息的字典，如果不匹配则返回None
     """
-    # 预处理标题
-    processed_titles = preprocess_titles([report_title])
+    if pd.isna(reference_text) or pd.isna(report_title):
+        return None
     
-    matches = []
+    ref_normalized = normalize_text(reference_text)
+    return _match_normalized(ref_normalized, processed_data[report_title], threshold)
+
+
+def _read_only(array):
+    """将数组标记为只读，防止共享语料库被某个会话修改"""
+    array.flags.writeable = False
+    return array
+
+
+def _find_column(df, name):
+    """不区分大小写、忽略首尾空格查找列名"""
+    for col in df.columns:
+        if str(col).strip().lower() == name:
+            return col
+    return None
+
+
+def _normalize_key_series(df, name):
+    """取出标识列并标准化为 strip().lower() 字符串，缺失值为空字符串"""
+    col = _find_column(df, name)
+    if col is None:
+        return pd.Series('', index=df.index)
+    return df[col].fillna('').astype(str).str.strip().str.lower()
+
+
+def _stable_paper_id(key):
+    """由论文键计算稳定的63位整数ID（跨进程、跨数据集一致）"""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') & 0x7FFFFFFFFFFFFFFF
+
+
+def compute_paper_ids(df, reference_df=None):
+    """
+    为数据集中的每篇论文分配稳定的整数ID
+    
+    优先使用DOI，其次EID，最后使用标准化标题（strip().lower()）。
+    提供 reference_df（已包含 'paper_id' 列，通常是regions数据）时，
+    先按DOI/EID、再按标题链接到其ID，保证两个数据集的同一篇论文ID相同。
+    
+    Args:
+        df: 包含 'Title' 列（可选 'DOI'、'EID' 列）的DataFrame
+        reference_df: 可选，已分配ID的数据集
+        
+    Returns:
+        np.ndarray: int64 论文ID数组，与 df 行对齐
+    """
+    doi = _normalize_key_series(df, 'doi')
+    eid = _normalize_key_series(df, 'eid')
+    title = _normalize_key_series(df, 'title')
+    
+    keys = np.where(doi != '', 'doi:' + doi,
+                    np.where(eid != '', 'eid:' + eid, 'title:' + title))
+    paper_ids = np.fromiter((_stable_paper_id(k) for k in keys), dtype=np.int64, count=len(keys))
+    
+    if reference_df is not None and 'paper_id' in reference_df.columns:
+        ref_ids = reference_df['paper_id'].to_numpy()
+        # 按优先级从低到高覆盖：标题 < EID < DOI
+        for name, values in (('title', title), ('eid', eid), ('doi', doi)):
+            ref_keys = _normalize_key_series(reference_df, name)
+            first = ((ref_keys != '') & ~ref_keys.duplicated()).to_numpy()
+            positions = pd.Index(ref_keys.to_numpy()[first]).get_indexer(values)
+            found = (positions >= 0) & (values != '').to_numpy()
+            paper_ids[found] = ref_ids[first][positions[found]]
+    
+    return paper_ids
+
+
+def _file_fingerprint(path):
+    """文件指纹：路径、大小和修改时间"""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def load_paper_ids(csv_path, df, reference_df=None, dependency_paths=()):
+    """
+    读取或生成与数据文件并列保存的论文ID（<csv_path>.paper_ids.npz）
+    
+    数据文件或依赖文件（例如用于链接的regions数据）变化后自动重新生成。
+    无法写入时（例如只读部署目录）直接返回计算结果。
+    
+    Args:
+        csv_path: 数据文件路径
+        df: 从该文件读取的DataFrame
+        reference_df: 可选，用于链接ID的数据集，见 compute_paper_ids
+        dependency_paths: 其他影响ID结果的文件路径
+        
+    Returns:
+        np.ndarray: int64 论文ID数组
+    """
+    sidecar_path = f"{csv_path}.paper_ids.npz"
+    fingerprint = ';'.join(_file_fingerprint(p) for p in (csv_path, *dependency_paths))
+    
+    try:
+        with np.load(sidecar_path) as saved:
+            if str(saved['fingerprint']) == fingerprint and len(saved['paper_id']) == len(df):
+                return saved['paper_id']
+    except (OSError, KeyError, ValueError):
+        pass
+    
+    paper_ids = compute_paper_ids(df, reference_df)
+    # 先写临时文件再替换：多个进程同时启动时不会读到写了一半的文件
+    tmp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, paper_id=paper_ids, fingerprint=np.array(fingerprint))
+        os.replace(tmp_path, sidecar_path)
+    except OSError:
+        pass
+    return paper_ids
+
+
+def build_reference_corpus(scopus_df, paper_ids=None, regions_df=None):
+    """
+    预处理Scopus引用数据，构建可在多个会话之间共享的只读语料库
+    
+    引用文本的标准化只在这里执行一次，之后所有搜索都直接复用。
+    筛选后的子集用行号数组表示（见 select_rows_by_paper_ids），
+    不再复制DataFrame。
+    
+    Args:
+        scopus_df: Scopus引用数据DataFrame (必须包含 'Title' 和 'Reference' 列)
+        paper_ids: 可选，引用论文ID数组（见 compute_paper_ids / load_paper_ids），
+                   未提供时按本数据集单独计算
+        regions_df: 可选，带 'paper_id' 列的regions数据，用于取得引用论文的出版年份
+                    （Scopus数据自带 'Year' 列时优先使用）
+        
+    Returns:
+        dict: 语料库，包含原始DataFrame、标准化引用文本（及其长度）和标题片段、DOI/URL索引、
+              引用论文ID及其排序（按论文查找行号），以及引用年份和引用论文年份（0 表示未知）
+    """
     reference_col = 'Reference'
     citing_paper_col = 'Title'
     
@@ -108,31 +373,522 @@ def search_single_report(report_title, scopus_df, threshold=85):
     if reference_col not in scopus_df.columns or citing_paper_col not in scopus_df.columns:
         raise ValueError(f"DataFrame必须包含 '{reference_col}' 和 '{citing_paper_col}' 列")
     
-    # 搜索匹配
-    for idx, row in scopus_df.iterrows():
-        reference_text = row[reference_col]
-        citing_paper = row[citing_paper_col]
+    # 行号即位置索引，后续所有筛选都以行号表示
+    df = scopus_df.reset_index(drop=True)
+    reference_text = df[reference_col].tolist()
+    citing_paper = df[citing_paper_col].tolist()
+    if paper_ids is None:
+        paper_ids = compute_paper_ids(df)
+    elif len(paper_ids) != len(df):
+        raise ValueError(f"paper_ids 长度 ({len(paper_ids)}) 与数据行数 ({len(df)}) 不一致")
+    
+    # DOI/URL 哈希索引：键 -> 行号数组
+    identifier_rows = {}
+    for idx, ref in enumerate(reference_text):
+        for key in extract_identifiers(ref):
+            identifier_rows.setdefault(key, []).append(idx)
+    identifier_index = {key: _read_only(np.array(rows, dtype=np.int64)) for key, rows in identifier_rows.items()}
+    
+    # 年份：引用文本中的年份，以及引用论文本身的出版年份
+    reference_year = np.fromiter((extract_reference_year(ref) for ref in reference_text), dtype=np.int16,
+                                 count=len(reference_text))
+    year_col = _find_column(df, 'year')
+    if year_col is not None:
+        citing_year_values = df[year_col]
+    else:
+        citing_year_values = _paper_attribute(regions_df, 'Year').reindex(paper_ids)
+    citing_year = np.fromiter((parse_year(v) or 0 for v in citing_year_values), dtype=np.int16, count=len(df))
+    reference_normalized = [normalize_text(ref) for ref in reference_text]
+    
+    return {
+        'df': df,
+        'size': len(df),
+        'fingerprint': _corpus_fingerprint(df[[citing_paper_col, reference_col]]),
+        'identifier_index': identifier_index,
+        'reference_text': reference_text,
+        'citing_paper': citing_paper,
+        'reference_normalized': reference_normalized,
+        'reference_length': _read_only(np.fromiter(map(len, reference_normalized), dtype=np.int32,
+                                                   count=len(reference_normalized))),
+        'reference_span': [extract_title_span(ref) for ref in reference_text],
+        'reference_valid': _read_only(df[reference_col].notna().to_numpy()),
+        'paper_id': _read_only(np.asarray(paper_ids, dtype=np.int64)),
+        'paper_order': _read_only(np.argsort(paper_ids, kind='stable')),
+        'reference_year': _read_only(reference_year),
+        'citing_year': _read_only(citing_year),
+    }
+
+
+def estimate_corpus_bytes(corpus):
+    """
+    估算语料库占用的内存（数组字节数 + 文本字符数 + 原始DataFrame），用于缓存容量控制
+    
+    Args:
+        corpus: build_reference_corpus 构建的语料库
+        
+    Returns:
+        int: 估算的字节数
+    """
+    total = 0
+    for key, value in corpus.items():
+        if isinstance(value, np.ndarray):
+            total += value.nbytes
+        elif isinstance(value, list):
+            # 每个字符串对象约 50 字节开销
+            total += sum(len(v) + 50 if isinstance(v, str) else 16 for v in value)
+        elif isinstance(value, pd.DataFrame):
+            total += int(value.memory_usage(deep=True).sum())
+        elif key == 'identifier_index':
+            total += sum(len(k) + 100 + rows.nbytes for k, rows in value.items())
+    return total
+
+
+def _corpus_fingerprint(df):
+    """基于内容的语料库指纹，与文件路径和修改时间无关"""
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes()).hexdigest()[:16]
+
+
+def load_regions_data(file_path):
+    """
+    加载regions数据：清理列名，生成标准化标题列和论文ID
+    
+    Args:
+        file_path: regions数据文件路径
+        
+    Returns:
+        pd.DataFrame: 带 'Title_normalized' 和 'paper_id' 列的数据
+    """
+    df = pd.read_csv(file_path)
+    # 清理所有列名：去除首尾空格
+    df.columns = df.columns.str.strip()
+    if 'Title' not in df.columns:
+        raise ValueError(f"'Title' column not found in '{os.path.basename(file_path)}'")
+    # 创建标准化的Title列和论文ID用于匹配
+    df['Title_normalized'] = df['Title'].str.strip().str.lower()
+    df['paper_id'] = load_paper_ids(file_path, df)
+    return df
+
+
+def load_reference_corpus(file_path, regions_df=None, regions_path=None):
+    """
+    加载Scopus引用数据文件并构建语料库，论文ID与regions数据链接
+    
+    Args:
+        file_path: Scopus引用数据文件路径
+        regions_df: 可选，load_regions_data 加载的regions数据
+        regions_path: 可选，regions数据文件路径（其变化会使保存的论文ID失效）
+        
+    Returns:
+        dict: build_reference_corpus 构建的语料库
+    """
+    scopus_df = pd.read_csv(file_path)
+    dependency_paths = [regions_path] if regions_path else []
+    paper_ids = load_paper_ids(file_path, scopus_df, regions_df, dependency_paths=dependency_paths)
+    return build_reference_corpus(scopus_df, paper_ids=paper_ids, regions_df=regions_df)
+
+
+# 从regions数据拆分引用时附带的论文信息列（重复值多，以 category 类型保存）
+REGIONS_ENRICHMENT_COLUMNS = ['Year', 'Source title', 'Country (First Author)', 'Region']
+
+
+def explode_regions_references(file_path, chunksize=5000, separator='; '):
+    """
+    流式读取regions数据，将分号连接的 'References' 列拆分为语料库所需的长表
+    
+    只读取标题、标识和少量信息列（跳过摘要等大字段），逐块拆分，
+    因此不需要单独维护 Complete_References_Scopus_FULL.csv。
+    
+    Args:
+        file_path: regions数据文件路径
+        chunksize: 每次读取的论文行数
+        separator: 引用之间的分隔符
+        
+    Returns:
+        pd.DataFrame: 'Title'、'Reference'、'paper_id' 列，以及 REGIONS_ENRICHMENT_COLUMNS 中存在的列
+    """
+    wanted = {'title', 'references', 'doi', 'eid', *(c.lower() for c in REGIONS_ENRICHMENT_COLUMNS)}
+    parts = []
+    
+    for chunk in pd.read_csv(file_path, chunksize=chunksize, usecols=lambda c: c.strip().lower() in wanted):
+        chunk.columns = chunk.columns.str.strip()
+        if 'References' not in chunk.columns or 'Title' not in chunk.columns:
+            raise ValueError(f"'{os.path.basename(file_path)}' 必须包含 'Title' 和 'References' 列")
+        
+        # 论文ID与 load_regions_data 的结果一致（逐行确定，与分块无关）
+        chunk['paper_id'] = compute_paper_ids(chunk)
+        enrichment = [c for c in REGIONS_ENRICHMENT_COLUMNS if c in chunk.columns]
+        
+        exploded = chunk[['Title', 'References', 'paper_id', *enrichment]].copy()
+        exploded['Reference'] = exploded.pop('References').str.split(separator)
+        exploded = exploded.explode('Reference', ignore_index=True)
+        exploded['Reference'] = exploded['Reference'].str.strip()
+        parts.append(exploded[exploded['Reference'].fillna('') != ''])
+    
+    if not parts:
+        return pd.DataFrame(columns=['Title', 'Reference', 'paper_id'])
+    
+    references = pd.concat(parts, ignore_index=True)
+    for col in ('Title', 'Source title', 'Country (First Author)', 'Region'):
+        if col in references.columns:
+            references[col] = references[col].astype('category')
+    return references
+
+
+def load_regions_reference_corpus(file_path):
+    """
+    直接由regions数据的 'References' 列构建语料库（论文ID和年份随拆分一起附带）
+    
+    Args:
+        file_path: regions数据文件路径
+        
+    Returns:
+        dict: build_reference_corpus 构建的语料库
+    """
+    references = explode_regions_references(file_path)
+    return build_reference_corpus(references, paper_ids=references['paper_id'].to_numpy())
+
+
+def load_preloaded_data(scopus_path, regions_path):
+    """
+    加载预置数据（命令行脚本共用，与应用的选择规则一致）：
+    没有单独的Scopus长表文件时，使用regions数据中的 'References' 列构建语料库
+    
+    Args:
+        scopus_path: Scopus引用数据文件路径
+        regions_path: regions数据文件路径
         
-        match_info = check_match(reference_text, report_title, processed_titles, threshold)
+    Returns:
+        tuple: (语料库, regions数据或None, 生成语料库所用的文件路径列表)
+    """
+    has_regions = os.path.exists(regions_path)
+    if not os.path.exists(scopus_path) and has_regions:
+        return load_regions_reference_corpus(regions_path), load_regions_data(regions_path), [regions_path]
+    if not os.path.exists(scopus_path):
+        raise FileNotFoundError(2, "文件不存在", scopus_path)
+    
+    regions_df = load_regions_data(regions_path) if has_regions else None
+    corpus = load_reference_corpus(scopus_path, regions_df, regions_path if has_regions else None)
+    return corpus, regions_df, [scopus_path] + ([regions_path] if has_regions else [])
+
+
+def _ensure_corpus(scopus_df):
+    """兼容旧接口：传入DataFrame时临时构建语料库"""
+    if isinstance(scopus_df, dict):
+        return scopus_df
+    return build_reference_corpus(scopus_df)
+
+
+def resolve_row_ids(corpus, row_ids=None):
+    """
+    将行号数组或布尔掩码统一转换为待搜索的行号序列
+    
+    Args:
+        corpus: build_reference_corpus 构建的语料库
+        row_ids: None（全部行）、行号数组，或长度等于语料库行数的布尔掩码
         
-        if match_info:
-            matches.append({
-                'citing_paper': citing_paper,
-                'reference_text': reference_text,
-                'similarity_score': match_info['similarity_score'],
-                'match_method': match_info['match_method']
-            })
+    Returns:
+        range 或 np.ndarray: 行号序列
+    """
+    if row_ids is None:
+        return range(corpus['size'])
+    
+    row_ids = np.asarray(row_ids)
+    if row_ids.dtype == bool:
+        if len(row_ids) != corpus['size']:
+            raise ValueError(f"布尔掩码长度 ({len(row_ids)}) 与语料库行数 ({corpus['size']}) 不一致")
+        return np.flatnonzero(row_ids)
+    return row_ids
+
+
+def prune_rows_by_year(corpus, rows, report_year, tolerance=YEAR_TOLERANCE):
+    """
+    剪掉不可能引用该报告的行：引用年份或引用论文出版年份早于报告出版年份
+    （允许 tolerance 年误差）。年份未知（0）的行保留。
     
-    # 计算统计信息
-    if matches:
-        citation_count = len(matches)
-        avg_similarity = np.mean([m['similarity_score'] for m in matches])
-        method_counts = Counter([m['match_method'] for m in matches])
+    Args:
+        corpus: build_reference_corpus 构建的语料库
+        rows: resolve_row_ids 返回的行号序列
+        report_year: 报告出版年份，None 表示不剪枝
+        tolerance: 允许的年份误差
+        
+    Returns:
+        行号序列
+    """
+    if not report_year:
+        return rows
+    rows = np.asarray(rows, dtype=np.int64)
+    feasible = _year_feasible(corpus['reference_year'][rows], corpus['citing_year'][rows], report_year, tolerance)
+    return rows[feasible]
+
+
+def _year_feasible(reference_year, citing_year, report_year, tolerance=YEAR_TOLERANCE):
+    """年份是否允许引用该报告（数组或标量均可，0 表示未知）"""
+    earliest = report_year - tolerance
+    return ((reference_year == 0) | (reference_year >= earliest)) & ((citing_year == 0) | (citing_year >= earliest))
+
+
+def select_rows_by_paper_ids(corpus, paper_ids):
+    """
+    根据引用论文ID选出语料库中的行号
+    
+    按语料库中预先排好的论文ID顺序二分查找，耗时与所选论文的引用数量成正比，
+    与语料库大小无关。
+    
+    Args:
+        corpus: build_reference_corpus 构建的语料库
+        paper_ids: 论文ID数组
+        
+    Returns:
+        np.ndarray: 升序排列的行号数组
+    """
+    paper_ids = np.unique(np.asarray(paper_ids, dtype=np.int64))
+    order = corpus['paper_order']
+    starts = np.searchsorted(corpus['paper_id'], paper_ids, side='left', sorter=order)
+    ends = np.searchsorted(corpus['paper_id'], paper_ids, side='right', sorter=order)
+    rows = np.concatenate([order[start:end] for start, end in zip(starts, ends) if end > start] or
+                          [np.zeros(0, dtype=np.int64)])
+    return _read_only(np.sort(rows))
+
+
+# 相似度滑块的最小值：按此阈值打分一次后，任意更高的阈值都可以直接从评分表筛选
+SCORE_FLOOR = 70
+# 匹配模式：只做直接包含（及DOI/URL）、再加模糊匹配、或全部三级匹配
+MATCH_MODES = ('exact', 'exact_fuzzy', 'full')
+# 批量搜索时归为同一报告的标题最低相似度，以及代表标题取候选行时放宽的分数
+NEAR_DUPLICATE_RATIO = 95
+NEAR_DUPLICATE_MARGIN = 15
+# 打分时每次批量读取的行数（SQLite 等存储后端按块读取文本）
+SCORE_CHUNK_SIZE = 2048
+# 分块扫描进度回调的最短间隔（秒），回调开销相对扫描可以忽略
+SCAN_PROGRESS_INTERVAL = 0.5
+# 快速计数每一步累计扫描的语料库比例（最后一步为全部行，结果即精确计数）
+QUICK_COUNT_STEPS = (0.02, 0.1, 0.3, 1.0)
+# 快速计数按参考文献年份分层时每层的年数
+QUICK_COUNT_STRATUM_YEARS = 5
+# 匹配方式，按优先级排列；匹配表中以下标（uint8）保存
+MATCH_METHODS = ('doi_match', 'exact_substring', 'fuzzy_match', 'word_overlap')
+# 计为精确引用的匹配方式（与匹配模式无关；100% 的模糊匹配或词语重叠不算）
+EXACT_METHODS = ('doi_match', 'exact_substring')
+# 匹配表的行格式：语料库行号（文本按需从语料库读取）、引用论文ID、相似度、匹配方式编号
+MATCH_DTYPE = np.dtype([('row_id', np.int64), ('paper_id', np.int64), ('similarity_score', np.float32),
+                        ('method', np.uint8)])
+
+
+def _take(column, rows):
+    """按行号批量取值：提供 take() 的列（numpy数组、存储后端）一次读取，列表逐个索引"""
+    if hasattr(column, 'take'):
+        return column.take(rows)
+    return [column[i] for i in rows]
+
+
+def _scan_progress(scan_callback, report_title, rows_total, interval=SCAN_PROGRESS_INTERVAL):
+    """
+    生成分块扫描的进度记录函数 tick(已扫描行数)：每扫描完一块调用一次，
+    距上次回调至少 interval 秒或扫描完成时才调用 scan_callback(进度字典)
+    
+    进度字典包含 'report_title'、'rows_scanned'、'rows_total'、'elapsed_seconds'、
+    'rows_per_second' 和 'eta_seconds'（按目前的吞吐量估计的剩余时间）
+    """
+    if scan_callback is None:
+        return lambda rows_scanned: None
+    start = time.perf_counter()
+    last_call = start
+    
+    def tick(rows_scanned):
+        nonlocal last_call
+        now = time.perf_counter()
+        if now - last_call < interval and rows_scanned < rows_total:
+            return
+        last_call = now
+        elapsed = now - start
+        rate = rows_scanned / elapsed if elapsed > 0 else 0.0
+        scan_callback({
+            'report_title': report_title,
+            'rows_scanned': rows_scanned,
+            'rows_total': rows_total,
+            'elapsed_seconds': elapsed,
+            'rows_per_second': rate,
+            'eta_seconds': (rows_total - rows_scanned) / rate if rate > 0 else None
+        })
+    
+    return tick
+
+
+def _score_normalized(ref_normalized, title_data, ref_span="", with_overlap=True, min_score=0):
+    """
+    对已标准化的引用文本计算全部匹配分数
+    
+    模糊匹配先对较短的标题片段 ref_span 打分（片段为空或比报告标题还短时直接用完整引用文本，
+    标题可能跨越多个逗号分隔的片段）。片段分数低于 min_score 时直接作为结果（候选被排除）；
+    否则再对完整引用文本打分并取两者中较小的值。截断的片段会抬高 partial_ratio 的边缘得分，
+    取较小值保证使用片段不会产生完整文本之外的匹配。
+    with_overlap 为 False 时不计算词语重叠（返回 0）。
+    
+    Returns:
+        tuple: (是否直接包含, 模糊匹配分数, 词语重叠比例)
+    """
+    title_normalized = title_data['normalized']
+    if title_normalized in ref_normalized:
+        return True, 100.0, 0.0
+    
+    if len(ref_span) >= len(title_normalized):
+        similarity = fuzz.partial_ratio(title_normalized, ref_span)
+        if similarity >= min_score:
+            similarity = min(similarity, fuzz.partial_ratio(title_normalized, ref_normalized))
+    else:
+        similarity = fuzz.partial_ratio(title_normalized, ref_normalized)
+    
+    overlap_ratio = 0.0
+    title_words = title_data['words']
+    if with_overlap and len(title_words) >= 3:
+        ref_words = set(ref_normalized.split())
+        overlap_ratio = len(title_words & ref_words) / len(title_words) * 100
+    
+    return False, float(similarity), overlap_ratio
+
+
+def score_report(report_title, scopus_df, row_ids=None, min_threshold=SCORE_FLOOR, report_meta=None, min_overlap=70,
+                 match_mode='full', scan_callback=None, use_candidates=None):
+    """
+    将报告标题与语料库逐条打分一次，保留在 min_threshold 下可能匹配的候选
+    
+    之后调整阈值（>= min_threshold）只需调用 apply_threshold 重新筛选评分表，
+    无需再次扫描语料库。报告带有DOI/URL时，先通过语料库的哈希索引直接命中
+    包含该DOI/URL的引用（doi_match），这些行不再参与模糊匹配。报告带有出版年份时，
+    引用年份或引用论文年份早于该年份的行在打分前被剪掉（见 prune_rows_by_year）。
+    语料库提供 'candidate_rows'（例如 SQLite 存储的全文索引，见 citation_store）时，
+    只对其返回的候选行打分。候选只在 'candidate_threshold' 及以上的阈值与全量扫描一致，
+    min_threshold 低于它时默认扫描全部行。
+    
+    match_mode 为 'exact' 时只检查直接包含（以及DOI/URL），不计算模糊匹配和词语重叠，
+    速度接近子串扫描；'exact_fuzzy' 不计算词语重叠。
+    
+    Args:
+        report_title: 报告标题
+        scopus_df: Scopus引用数据DataFrame，或 build_reference_corpus 构建的语料库
+        row_ids: 可选，行号数组或布尔掩码，只在这些行中搜索
+        min_threshold: 评分表支持的最低相似度阈值
+        min_overlap: 保留的最低词语重叠比例（低于 70 时仅用于取得候选行，见 search_multiple_reports）
+        match_mode: MATCH_MODES 之一
+        report_meta: 可选，报告元数据（'doi'、'url'、'year'），见 parse_report_list
+        scan_callback: 可选，扫描进度回调（按 SCAN_PROGRESS_INTERVAL 节流），参数见 _scan_progress；
+                       总行数为剪枝后实际打分的行数
+        use_candidates: 是否使用语料库的 'candidate_rows'；None 时按 min_threshold 与
+                        'candidate_threshold' 决定
+        
+    Returns:
+        dict: 评分表，'scores' 为 DataFrame（row_id、key_match、exact、fuzzy_score、overlap_score）
+    """
+    if match_mode not in MATCH_MODES:
+        raise ValueError(f"未知的匹配模式 '{match_mode}'，可选: {', '.join(MATCH_MODES)}")
+    corpus = _ensure_corpus(scopus_df)
+    
+    # 预处理标题
+    processed_titles = preprocess_titles([report_title])
+    
+    row_list, key_list, exact_list, fuzzy_list, overlap_list = [], [], [], [], []
+    
+    # DOI/URL 快速通道：字典查找
+    key_match = np.zeros(corpus['size'], dtype=bool)
+    for key in report_identifier_keys(report_meta):
+        key_match[corpus['identifier_index'].get(key, [])] = True
+    
+    if report_title in processed_titles or key_match.any():
+        title_data = processed_titles.get(report_title)
+        rows = np.asarray(resolve_row_ids(corpus, row_ids), dtype=np.int64)
+        
+        if title_data is None:
+            usable = np.zeros(corpus['size'], dtype=bool)
+        else:
+            usable = corpus['reference_valid']
+            report_year = (report_meta or {}).get('year')
+            if report_year:
+                # 年份剪枝（DOI/URL 命中的行不受影响）
+                feasible = np.zeros(corpus['size'], dtype=bool)
+                feasible[prune_rows_by_year(corpus, rows, report_year)] = True
+                usable = usable & feasible
+            candidate_rows = corpus.get('candidate_rows')
+            if use_candidates is None:
+                use_candidates = min_threshold >= corpus.get('candidate_threshold', 0)
+            candidates = None
+            if candidate_rows is not None and use_candidates:
+                candidates = candidate_rows(title_data['normalized'])
+            if candidates is not None:
+                # 全文索引候选（DOI/URL 命中的行不受影响）
+                retrieved = np.zeros(corpus['size'], dtype=bool)
+                retrieved[candidates] = True
+                usable = usable & retrieved
+        rows = rows[usable[rows] | key_match[rows]]
+        
+        exact_only = match_mode == 'exact'
+        with_overlap = match_mode == 'full'
+        tick = _scan_progress(scan_callback, report_title, len(rows))
+        for start in range(0, len(rows), SCORE_CHUNK_SIZE):
+            chunk = rows[start:start + SCORE_CHUNK_SIZE]
+            texts = _take(corpus['reference_normalized'], chunk)
+            spans = [''] * len(chunk) if exact_only else _take(corpus['reference_span'], chunk)
+            
+            for idx, ref_normalized, ref_span in zip(chunk, texts, spans):
+                if key_match[idx]:
+                    row_list.append(idx)
+                    key_list.append(True)
+                    exact_list.append(False)
+                    fuzzy_list.append(0.0)
+                    overlap_list.append(0.0)
+                    continue
+                
+                if exact_only:
+                    # 快速通道：只做子串检查
+                    if title_data['normalized'] in ref_normalized:
+                        row_list.append(idx)
+                        key_list.append(False)
+                        exact_list.append(True)
+                        fuzzy_list.append(100.0)
+                        overlap_list.append(0.0)
+                    continue
+                
+                exact, similarity, overlap_ratio = _score_normalized(ref_normalized, title_data, ref_span,
+                                                                     with_overlap, min_threshold)
+                
+                if exact or similarity >= min_threshold or overlap_ratio >= min_overlap:
+                    row_list.append(idx)
+                    key_list.append(False)
+                    exact_list.append(exact)
+                    fuzzy_list.append(similarity)
+                    overlap_list.append(overlap_ratio)
+            tick(start + len(chunk))
+    
+    return _score_table(report_title, min_threshold, row_list, key_list, exact_list, fuzzy_list, overlap_list,
+                        match_mode)
+
+
+def _score_table(report_title, min_threshold, row_list, key_list, exact_list, fuzzy_list, overlap_list,
+                 match_mode='full'):
+    """由逐行打分结果生成评分表（格式见 score_report）"""
+    return {
+        'report_title': report_title,
+        'min_threshold': min_threshold,
+        'match_mode': match_mode,
+        'scores': pd.DataFrame({
+            'row_id': np.array(row_list, dtype=np.int64),
+            'key_match': np.array(key_list, dtype=bool),
+            'exact': np.array(exact_list, dtype=bool),
+            'fuzzy_score': np.array(fuzzy_list, dtype=np.float64),
+            'overlap_score': np.array(overlap_list, dtype=np.float64)
+        })
+    }
+
+
+def _build_result(report_title, matches, similarity):
+    """由匹配表计算统计信息，生成搜索结果字典（similarity 为未降精度的相似度，用于计算平均值）"""
+    if len(matches):
+        method_counts = Counter(np.asarray(MATCH_METHODS)[matches['method']].tolist())
         
         return {
             'report_title': report_title,
-            'citation_count': citation_count,
-            'average_similarity': round(avg_similarity, 2),
+            'citation_count': len(matches),
+            'average_similarity': round(float(np.mean(similarity)), 2),
             'match_methods': dict(method_counts),
             'matches': matches
         }
@@ -142,36 +898,646 @@ def search_single_report(report_title, scopus_df, threshold=85):
             'citation_count': 0,
             'average_similarity': 0,
             'match_methods': {},
-            'matches': []
+            'matches': matches
         }
 
 
-def search_multiple_reports(report_titles, scopus_df, threshold=85, progress_callback=None):
+def _empty_matches(size=0):
+    return np.zeros(size, dtype=MATCH_DTYPE)
+
+
+def matches_to_json(matches):
+    """匹配表 -> 可JSON序列化的 {字段: 列表}（用于检查点）"""
+    return {name: matches[name].tolist() for name in MATCH_DTYPE.names}
+
+
+def matches_from_json(data):
+    """matches_to_json 的逆操作"""
+    matches = _empty_matches(len(data['row_id']))
+    for name in MATCH_DTYPE.names:
+        matches[name] = data[name]
+    return matches
+
+
+def apply_threshold(score_table, scopus_df, threshold=85):
+    """
+    按相似度阈值筛选评分表，生成与 search_single_report 相同的搜索结果
+    
+    Args:
+        score_table: score_report 生成的评分表
+        scopus_df: 生成评分表时使用的语料库
+        threshold: 相似度阈值（不能低于评分表的 min_threshold）
+        
+    Returns:
+        dict: 包含引用信息的字典，格式见 search_single_report
+    """
+    if threshold < score_table['min_threshold']:
+        raise ValueError(f"阈值 {threshold} 低于评分表的最低阈值 {score_table['min_threshold']}")
+    
+    corpus = _ensure_corpus(scopus_df)
+    scores = score_table['scores']
+    key_match = scores['key_match'].to_numpy()
+    exact = scores['exact'].to_numpy()
+    fuzzy_score = scores['fuzzy_score'].to_numpy()
+    overlap_score = scores['overlap_score'].to_numpy()
+    
+    # DOI/URL 命中优先，其余与 check_match 的判定顺序一致：直接包含 > 模糊匹配 > 词语重叠
+    conditions = [key_match, exact, fuzzy_score >= threshold, overlap_score >= 70]
+    keep = np.flatnonzero(np.logical_or.reduce(conditions))
+    conditions = [condition[keep] for condition in conditions]
+    methods = np.select(conditions, list(range(len(MATCH_METHODS))))
+    similarity = np.select(conditions, [100.0, 100.0, fuzzy_score[keep], overlap_score[keep]])
+    
+    matches = _empty_matches(len(keep))
+    matches['row_id'] = scores['row_id'].to_numpy()[keep]
+    matches['paper_id'] = _take(corpus['paper_id'], matches['row_id'])
+    matches['similarity_score'] = similarity
+    matches['method'] = methods
+    
+    return _build_result(score_table['report_title'], matches, similarity)
+
+
+def search_single_report(report_title, scopus_df, threshold=85, row_ids=None, report_meta=None, match_mode='full',
+                         scan_callback=None):
+    """
+    搜索单个报告的引用情况
+    
+    Args:
+        report_title: 报告标题
+        scopus_df: Scopus引用数据DataFrame (必须包含 'Title' 和 'Reference' 列)，
+                   或 build_reference_corpus 构建的语料库
+        threshold: 相似度阈值
+        row_ids: 可选，行号数组或布尔掩码，只在这些行中搜索（用于关键词筛选后的数据库）
+        report_meta: 可选，报告元数据（'doi'、'url'、'year'），用于DOI/URL精确匹配和年份剪枝
+        match_mode: MATCH_MODES 之一，见 score_report
+        scan_callback: 可选，扫描进度回调，见 score_report
+        
+    Returns:
+        dict: 包含引用信息的字典；'matches' 为 MATCH_DTYPE 结构化数组（匹配表），
+              只保存语料库行号，文本用 match_frame 按需读取
+    """
+    corpus = _ensure_corpus(scopus_df)
+    score_table = score_report(report_title, corpus, row_ids, min_threshold=threshold, report_meta=report_meta,
+                               match_mode=match_mode, scan_callback=scan_callback)
+    return apply_threshold(score_table, corpus, threshold)
+
+
+def search_multiple_reports(report_titles, scopus_df, threshold=85, progress_callback=None, row_ids=None,
+                            report_metadata=None, match_mode='full', checkpoint_dir=None, scan_callback=None):
     """
     批量搜索多个报告的引用情况
     
+    近似重复的标题（见 cluster_report_titles）只扫描一次语料库，每个标题的结果
+    与单独调用 search_single_report 相同（'exact' 模式本身已是子串扫描，不聚类；
+    语料库的全文索引候选在 threshold 下可用时也不聚类，见 score_report）。
+    进度回调按完成顺序调用，返回列表与 report_titles 顺序一致。
+    
+    提供 checkpoint_dir 时，每完成一个报告就把结果追加到检查点文件（按语料库指纹、
+    匹配规则版本和搜索参数命名）；中断后用相同参数重新运行会跳过已完成的报告。
+    
     Args:
         report_titles: 报告标题列表
-        scopus_df: Scopus引用数据DataFrame
+        scopus_df: Scopus引用数据DataFrame，或 build_reference_corpus 构建的语料库
         threshold: 相似度阈值
         progress_callback: 进度回调函数
+        row_ids: 可选，行号数组或布尔掩码，只在这些行中搜索
+        report_metadata: 可选，{标题: 元数据字典}，见 parse_report_list
+        match_mode: MATCH_MODES 之一，见 score_report
+        checkpoint_dir: 可选，检查点文件所在目录
+        scan_callback: 可选，每个报告扫描语料库时的进度回调（近似重复标题的共用扫描按代表标题报告），
+                       见 score_report
         
     Returns:
         list: 包含每个报告搜索结果的列表
     """
-    results = []
+    results = [None] * len(report_titles)
     total = len(report_titles)
+    completed = 0
+    # 整个批次共用一次预处理
+    corpus = _ensure_corpus(scopus_df)
+    row_ids = None if row_ids is None else resolve_row_ids(corpus, row_ids)
+    report_metadata = report_metadata or {}
     
-    for i, title in enumerate(report_titles, 1):
-        result = search_single_report(title, scopus_df, threshold)
-        results.append(result)
+    checkpoint = None
+    if checkpoint_dir:
+        checkpoint = open_checkpoint(checkpoint_dir, 'batch', corpus, threshold=threshold, match_mode=match_mode,
+                                     row_ids=_row_ids_digest(row_ids))
+        for i, title in enumerate(report_titles):
+            results[i] = checkpoint['done'].get(_checkpoint_key(title, report_metadata.get(title)))
+            if results[i] is not None:
+                completed += 1
+                if progress_callback:
+                    progress_callback(completed, total, results[i])
+    
+    # 全文索引候选已把每个标题的扫描缩小到少数行；共用扫描的代表标题在放宽的阈值下打分，
+    # 用不上候选，反而更慢
+    indexed = corpus.get('candidate_rows') is not None and threshold >= corpus.get('candidate_threshold', 0)
+    if match_mode == 'exact' or indexed:
+        clusters = [[i] for i in range(total)]
+    else:
+        clusters = cluster_report_titles(report_titles)
+    
+    for cluster in clusters:
+        cluster = [i for i in cluster if results[i] is None]
+        if not cluster:
+            continue
+        min_overlap = 70 - NEAR_DUPLICATE_MARGIN
+        if match_mode == 'full' and len(cluster) > 1:
+            min_overlap = _cluster_min_overlap(report_titles[cluster[0]], [report_titles[i] for i in cluster])
+        if len(cluster) == 1 or min_overlap is None:
+            scopes = {i: row_ids for i in cluster}
+        else:
+            # 近似重复的标题共用一次全库扫描：代表标题在放宽的阈值下取得候选行，
+            # 每个标题再只对这些候选（以及自己的 DOI/URL 命中）按原规则打分。
+            # 比标题短的引用在模糊匹配中作为被查找的一方，与代表标题的分数无关，全部保留
+            representative = report_titles[cluster[0]]
+            candidates = score_report(representative, corpus, row_ids,
+                                      min_threshold=threshold - NEAR_DUPLICATE_MARGIN,
+                                      min_overlap=min_overlap,
+                                      match_mode=match_mode, scan_callback=scan_callback)['scores']['row_id'].to_numpy()
+            longest = max(len(normalize_text(report_titles[i])) for i in cluster)
+            short_rows = np.flatnonzero(corpus['reference_length'] <= longest)
+            if row_ids is not None:
+                short_rows = short_rows[np.isin(short_rows, row_ids)]
+            candidates = np.union1d(candidates, short_rows)
+            scopes = {}
+            for i in cluster:
+                scopes[i] = _with_identifier_rows(corpus, candidates, report_metadata.get(report_titles[i]), row_ids)
         
-        if progress_callback:
-            progress_callback(i, total, result)
+        for i in cluster:
+            title = report_titles[i]
+            results[i] = search_single_report(title, corpus, threshold, row_ids=scopes[i],
+                                              report_meta=report_metadata.get(title), match_mode=match_mode,
+                                              scan_callback=scan_callback)
+            if checkpoint is not None:
+                append_checkpoint(checkpoint, title, report_metadata.get(title), results[i])
+            completed += 1
+            if progress_callback:
+                progress_callback(completed, total, results[i])
     
     return results
 
 
+# 检查点记录格式版本（2：匹配表按列保存）
+CHECKPOINT_FORMAT = 2
+
+
+def _row_ids_digest(row_ids):
+    """行号范围的摘要（None 表示全部行），用于检查点命名"""
+    if row_ids is None:
+        return 'all'
+    return hashlib.sha256(np.asarray(row_ids, dtype=np.int64).tobytes()).hexdigest()[:16]
+
+
+def _checkpoint_key(report_title, report_meta):
+    """检查点记录的键：报告标题和其元数据（元数据不同结果可能不同）"""
+    return json.dumps([report_title, report_meta or {}], sort_keys=True, ensure_ascii=False, default=str)
+
+
+def open_checkpoint(checkpoint_dir, kind, corpus, **params):
+    """
+    打开（或新建）批量任务的检查点文件，读取已完成的报告
+    
+    文件名由任务类型、语料库指纹、论文ID（由regions数据对齐生成，见 compute_paper_ids）、
+    匹配规则版本和 params 计算，参数不同的任务互不影响；regions数据变化后旧文件中的论文ID
+    不再使用。文件为 JSON Lines，每行一个已完成的报告；进程中断时写了一半的行会被忽略。
+    文件不会自动删除，长期运行的服务用 prune_checkpoints 限制目录大小。
+    
+    Args:
+        checkpoint_dir: 检查点文件所在目录（不存在时自动创建）
+        kind: 任务类型，例如 'batch'、'leaderboard'
+        corpus: build_reference_corpus 构建的语料库
+        **params: 影响结果的其他参数（需可JSON序列化）
+        
+    Returns:
+        dict: 'path'（文件路径）和 'done'（{记录键: 已保存的结果}）
+    """
+    paper_ids = hashlib.sha256(np.ascontiguousarray(corpus['paper_id'], dtype=np.int64).tobytes()).hexdigest()[:16]
+    params = dict(params, kind=kind, corpus_fingerprint=corpus['fingerprint'], paper_ids=paper_ids,
+                  matching_version=MATCHING_VERSION, checkpoint_format=CHECKPOINT_FORMAT)
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = os.path.join(checkpoint_dir, f"{kind}_{digest}.jsonl")
+    
+    done = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    result = record['result']
+                    if 'matches' in result:
+                        result['matches'] = matches_from_json(result['matches'])
+                    done[_checkpoint_key(record['report_title'], record['report_meta'])] = result
+                except (ValueError, KeyError, TypeError):
+                    continue
+    return {'path': path, 'done': done}
+
+
+def prune_checkpoints(checkpoint_dir, kind, max_bytes=None, max_age_seconds=None):
+    """
+    删除 kind 类型的旧检查点文件：超过 max_age_seconds 未更新的文件，以及总大小超过
+    max_bytes 时最久未更新的文件（正在运行的任务每完成一个报告都会更新其文件）
+    
+    Args:
+        checkpoint_dir: 检查点文件所在目录（不存在时不做任何事）
+        kind: 任务类型，见 open_checkpoint
+        max_bytes: 可选，该类型文件的总大小上限
+        max_age_seconds: 可选，文件未更新的最长时间
+        
+    Returns:
+        int: 删除的文件数
+    """
+    if not os.path.isdir(checkpoint_dir):
+        return 0
+    files = []
+    for name in os.listdir(checkpoint_dir):
+        if name.startswith(f"{kind}_") and name.endswith('.jsonl'):
+            path = os.path.join(checkpoint_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+    files.sort(reverse=True)
+    
+    removed = 0
+    total = 0
+    now = time.time()
+    for mtime, size, path in files:
+        total += size
+        expired = max_age_seconds is not None and now - mtime > max_age_seconds
+        if expired or (max_bytes is not None and total > max_bytes):
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+            total -= size
+    return removed
+
+
+def append_checkpoint(checkpoint, report_title, report_meta, result):
+    """把一个已完成报告的结果追加到检查点文件并立即落盘"""
+    saved = dict(result, matches=matches_to_json(result['matches'])) if 'matches' in result else result
+    record = json.dumps({'report_title': report_title, 'report_meta': report_meta or {}, 'result': saved},
+                        ensure_ascii=False, default=str)
+    # 上次中断可能留下不完整的最后一行，先补上换行，避免与新记录连在一起
+    if os.path.exists(checkpoint['path']) and os.path.getsize(checkpoint['path']) > 0:
+        with open(checkpoint['path'], 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                record = '\n' + record
+    with open(checkpoint['path'], 'a', encoding='utf-8') as f:
+        f.write(record + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    checkpoint['done'][_checkpoint_key(report_title, report_meta)] = result
+
+
+def estimate_search_cost(report_titles, scopus_df, row_ids=None, match_mode='full', sample_size=2000):
+    """
+    估算批量搜索的耗时：用前几个报告在一小部分行上实测每次比较的耗时，再按
+    报告数 × 行数外推（未计入近似重复标题共用扫描节省的时间，是上限估计）
+    
+    Args:
+        report_titles: 报告标题列表
+        scopus_df: Scopus引用数据DataFrame，或 build_reference_corpus 构建的语料库
+        row_ids: 可选，行号数组或布尔掩码，只在这些行中搜索
+        match_mode: MATCH_MODES 之一
+        sample_size: 实测使用的行数
+        
+    Returns:
+        dict: 'comparisons'（报告 × 引用的比较次数）和 'seconds'（估计耗时）
+    """
+    corpus = _ensure_corpus(scopus_df)
+    rows = np.asarray(resolve_row_ids(corpus, row_ids), dtype=np.int64)
+    comparisons = len(report_titles) * len(rows)
+    sample_rows = rows[:sample_size]
+    sample_titles = [t for t in report_titles[:3] if pd.notna(t)]
+    if not comparisons or not len(sample_rows) or not sample_titles:
+        return {'comparisons': comparisons, 'seconds': 0.0}
+    
+    start = time.perf_counter()
+    for title in sample_titles:
+        score_report(title, corpus, sample_rows, match_mode=match_mode)
+    per_comparison = (time.perf_counter() - start) / (len(sample_titles) * len(sample_rows))
+    return {'comparisons': comparisons, 'seconds': per_comparison * comparisons}
+
+
+def _stratified_permutation(corpus, rows, seed):
+    """按参考文献年份（QUICK_COUNT_STRATUM_YEARS 年一档，年份未知为单独一层）分层，每层内随机排列"""
+    strata_key = corpus['reference_year'][rows] // QUICK_COUNT_STRATUM_YEARS
+    rng = np.random.default_rng(seed)
+    return [rng.permutation(rows[strata_key == key]) for key in np.unique(strata_key)]
+
+
+def _stratified_estimate(report_title, hits, scanned, sizes, z, confidence):
+    """
+    由各层的抽样命中数估计总引用次数（分层比例估计，含有限总体校正的正态近似区间）
+    
+    方差使用平滑后的比例 (命中 + 0.5) / (样本 + 1)，零命中的层也保留不确定性；
+    区间下限不低于已发现的命中数，上限不超过 已发现命中数 + 未扫描行数。
+    """
+    found = int(hits.sum())
+    unscanned = int((sizes - scanned).sum())
+    if unscanned == 0:
+        estimate, lower, upper = float(found), found, found
+    else:
+        estimate = float(np.sum(sizes * hits / scanned))
+        smoothed = (hits + 0.5) / (scanned + 1)
+        variance = np.sum(sizes ** 2 * (1 - scanned / sizes) * smoothed * (1 - smoothed) / np.maximum(scanned - 1, 1))
+        margin = z * math.sqrt(variance)
+        lower = max(found, math.floor(estimate - margin))
+        upper = min(found + unscanned, math.ceil(estimate + margin))
+    return {
+        'report_title': report_title,
+        'citation_count': int(round(estimate)),
+        'estimate': round(estimate, 2),
+        'lower': int(lower),
+        'upper': int(upper),
+        'confidence': confidence,
+        'scanned_rows': int(scanned.sum()),
+        'total_rows': int(sizes.sum()),
+        'exact': unscanned == 0
+    }
+
+
+def quick_count_reports(report_titles, scopus_df, threshold=85, row_ids=None, report_metadata=None,
+                        match_mode='full', steps=QUICK_COUNT_STEPS, confidence=0.95, seed=0, progress_callback=None):
+    """
+    快速估计多个报告的引用次数：对语料库的分层随机样本打分，逐步扩大样本并更新估计
+    
+    行按参考文献年份分层（报告的引用集中在其出版年份之后的少数几年），每层按相同比例抽样。
+    每一步只对新增的样本行打分并累计各层命中数，因此全部步骤的总耗时与一次完整搜索相同；
+    最后一步扫描全部行时，'citation_count' 与 search_single_report 的结果完全一致。
+    
+    Args:
+        report_titles: 报告标题列表
+        scopus_df: Scopus引用数据DataFrame，或 build_reference_corpus 构建的语料库
+        threshold: 相似度阈值
+        row_ids: 可选，行号数组或布尔掩码，只在这些行中搜索
+        report_metadata: 可选，{标题: 元数据字典}，见 parse_report_list
+        match_mode: MATCH_MODES 之一，见 score_report
+        steps: 每一步累计扫描的比例（递增，最后为 1.0 时得到精确计数）
+        confidence: 置信区间的置信水平
+        seed: 随机种子（相同种子的抽样顺序相同）
+        progress_callback: 可选，每一步后调用 progress_callback(已扫描行数, 总行数, 估计列表)
+        
+    Returns:
+        list: 每个报告的估计（与 report_titles 顺序一致），包含 'citation_count'（估计值取整）、
+              'estimate'、'lower'/'upper'（置信区间）、'confidence'、'scanned_rows'、'total_rows'、
+              'exact'（是否已扫描全部行）
+    """
+    corpus = _ensure_corpus(scopus_df)
+    report_metadata = report_metadata or {}
+    rows = np.asarray(resolve_row_ids(corpus, row_ids), dtype=np.int64)
+    strata = _stratified_permutation(corpus, rows, seed)
+    sizes = np.array([len(stratum) for stratum in strata], dtype=np.int64)
+    scanned = np.zeros(len(strata), dtype=np.int64)
+    hits = np.zeros((len(report_titles), len(strata)), dtype=np.int64)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    
+    estimates = []
+    for step in steps:
+        # 每层至少抽 2 行（能估计方差），不超过该层行数
+        targets = np.minimum(sizes, np.maximum(np.ceil(sizes * step).astype(np.int64), 2))
+        new_rows = np.concatenate([stratum[start:end] for stratum, start, end in zip(strata, scanned, targets)]
+                                  + [np.zeros(0, dtype=np.int64)])
+        labels = np.repeat(np.arange(len(strata)), targets - scanned)
+        order = np.argsort(new_rows)
+        new_rows, labels = new_rows[order], labels[order]
+        
+        if len(new_rows):
+            for i, title in enumerate(report_titles):
+                result = search_single_report(title, corpus, threshold, row_ids=new_rows,
+                                              report_meta=report_metadata.get(title), match_mode=match_mode)
+                matched = np.searchsorted(new_rows, result['matches']['row_id'])
+                hits[i] += np.bincount(labels[matched], minlength=len(strata))
+        scanned = targets
+        
+        estimates = [_stratified_estimate(title, hits[i], scanned, sizes, z, confidence)
+                     for i, title in enumerate(report_titles)]
+        if progress_callback:
+            progress_callback(int(scanned.sum()), len(rows), estimates)
+    return estimates
+
+
+def cluster_report_titles(report_titles, min_ratio=NEAR_DUPLICATE_RATIO):
+    """
+    将近似重复的报告标题聚类（大小写、标点、个别字词不同的同一报告）
+    
+    使用与 check_match 相同的标准化，标准化后的标题 fuzz.ratio 不低于 min_ratio
+    时归入同一类。每类的第一个标题为代表。
+    
+    Args:
+        report_titles: 报告标题列表
+        min_ratio: 归为同一类的最低相似度
+        
+    Returns:
+        list: 每类在 report_titles 中的下标列表，按首次出现的顺序排列
+    """
+    clusters = []
+    representatives = []
+    for i, title in enumerate(report_titles):
+        normalized = normalize_text(title)
+        for cluster, rep_normalized in zip(clusters, representatives):
+            if normalized and fuzz.ratio(normalized, rep_normalized) >= min_ratio:
+                cluster.append(i)
+                break
+        else:
+            clusters.append([i])
+            representatives.append(normalized)
+    return clusters
+
+
+def _cluster_min_overlap(representative, titles):
+    """
+    近似重复标题共用扫描时，代表标题取候选行的词语重叠下限（百分比）
+    
+    标题 t 的词语重叠匹配要求引用包含 t 的至少 70% 的词，此时引用至少包含代表标题 r 的
+    70%·|t| - |t - r| 个词；取各标题下限的最小值（不超过 70 - NEAR_DUPLICATE_MARGIN），
+    保证每个标题的词语重叠匹配都在候选中。下限不为正（或代表标题不足 3 个词，不计算
+    词语重叠）时返回 None，表示这一类不能共用扫描。
+    """
+    rep_words = set(normalize_text(representative).split())
+    min_overlap = 70 - NEAR_DUPLICATE_MARGIN
+    for title in titles:
+        words = set(normalize_text(title).split())
+        if len(words) < 3:
+            continue
+        if len(rep_words) < 3:
+            return None
+        # 向下取整的词数，与打分时相同的算式换算为百分比，避免浮点误差漏掉候选
+        common = math.floor(0.7 * len(words)) - len(words - rep_words)
+        if common <= 0:
+            return None
+        min_overlap = min(min_overlap, common / len(rep_words) * 100)
+    return min_overlap
+
+
+def _with_identifier_rows(corpus, candidates, report_meta, row_ids=None):
+    """在候选行中加入该报告 DOI/URL 命中的行（限于 row_ids 范围内）"""
+    key_rows = [corpus['identifier_index'].get(key, []) for key in report_identifier_keys(report_meta)]
+    key_rows = np.concatenate([np.asarray(rows, dtype=np.int64) for rows in key_rows] or [np.zeros(0, dtype=np.int64)])
+    if row_ids is not None:
+        key_rows = key_rows[np.isin(key_rows, row_ids)]
+    return np.union1d(candidates, key_rows)
+
+
+def shard_report_titles(report_titles, shard_count):
+    """
+    将报告列表确定性地分成 shard_count 个分片
+    
+    近似重复的标题（见 cluster_report_titles）分到同一分片以便共用扫描；
+    各类按大小从大到小依次分给当前标题最少的分片（相同时取编号最小的）。
+    
+    Args:
+        report_titles: 报告标题列表
+        shard_count: 分片数
+        
+    Returns:
+        list: 每个分片在 report_titles 中的下标列表（升序）
+    """
+    if shard_count < 1:
+        raise ValueError("分片数必须至少为 1")
+    shards = [[] for _ in range(shard_count)]
+    for cluster in sorted(cluster_report_titles(report_titles), key=len, reverse=True):
+        min(shards, key=len).extend(cluster)
+    return [sorted(shard) for shard in shards]
+
+
+def _shard_checkpoint_dir(output_dir, shard_index, shard_count):
+    return os.path.join(output_dir, f"shard-{shard_index + 1}-of-{shard_count}")
+
+
+def run_batch_shard(report_titles, scopus_df, shard_index, shard_count, output_dir, threshold=85,
+                    progress_callback=None, row_ids=None, report_metadata=None, match_mode='full'):
+    """
+    运行批量搜索的一个分片，结果写入 output_dir 下该分片的检查点
+    
+    各分片可以是本机的独立进程，也可以在共享文件系统的不同主机上运行；
+    重新运行会跳过已完成的报告。全部完成后用 merge_batch_shards 合并。
+    
+    Args:
+        report_titles: 完整的报告标题列表（所有分片必须相同）
+        scopus_df: Scopus引用数据DataFrame，或 build_reference_corpus 构建的语料库
+        shard_index: 分片编号（从 0 开始）
+        shard_count: 分片数
+        output_dir: 分片结果目录
+        其余参数同 search_multiple_reports
+        
+    Returns:
+        list: 本分片报告的搜索结果
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"分片编号 {shard_index} 超出范围 0-{shard_count - 1}")
+    titles = [report_titles[i] for i in shard_report_titles(report_titles, shard_count)[shard_index]]
+    return search_multiple_reports(titles, scopus_df, threshold, progress_callback, row_ids=row_ids,
+                                   report_metadata=report_metadata, match_mode=match_mode,
+                                   checkpoint_dir=_shard_checkpoint_dir(output_dir, shard_index, shard_count))
+
+
+def merge_batch_shards(report_titles, scopus_df, output_dir, shard_count, threshold=85, row_ids=None,
+                       report_metadata=None, match_mode='full'):
+    """
+    合并各分片的结果，按 report_titles 的顺序返回，与单机运行 search_multiple_reports 的结果相同
+    
+    只读取与本次参数（语料库指纹、匹配规则版本、阈值、匹配模式、行范围）一致的分片结果。
+    
+    Args:
+        与 run_batch_shard 相同（不含分片编号）
+        
+    Returns:
+        list: 包含每个报告搜索结果的列表
+        
+    Raises:
+        ValueError: 仍有报告没有结果（分片未运行或未完成）
+    """
+    corpus = _ensure_corpus(scopus_df)
+    row_ids = None if row_ids is None else resolve_row_ids(corpus, row_ids)
+    report_metadata = report_metadata or {}
+    
+    done = {}
+    for shard_index in range(shard_count):
+        checkpoint = open_checkpoint(_shard_checkpoint_dir(output_dir, shard_index, shard_count), 'batch', corpus,
+                                     threshold=threshold, match_mode=match_mode, row_ids=_row_ids_digest(row_ids))
+        done.update(checkpoint['done'])
+    
+    keys = [_checkpoint_key(title, report_metadata.get(title)) for title in report_titles]
+    missing = [title for title, key in zip(report_titles, keys) if key not in done]
+    if missing:
+        raise ValueError(f"{len(missing)} 个报告尚无结果（例如 '{missing[0]}'），请先完成全部 {shard_count} 个分片")
+    return [done[key] for key in keys]
+
+
+def find_cited_reports(citing_paper_ids, report_titles, scopus_df, threshold=85, report_metadata=None):
+    """
+    反向查找：给定引用论文，找出其引用了报告列表中的哪些报告
+    
+    只取出这些论文的引用（见 select_rows_by_paper_ids），每条引用与全部报告标题
+    比较一次，耗时与论文的引用数量成正比，与语料库大小无关。
+    匹配规则（DOI/URL、年份剪枝、三级匹配）与 search_single_report 完全相同，
+    因此结果等于对每个报告做正向搜索后只保留这些论文的匹配。
+    
+    Args:
+        citing_paper_ids: 引用论文ID数组
+        report_titles: 报告标题列表
+        scopus_df: Scopus引用数据DataFrame，或 build_reference_corpus 构建的语料库
+        threshold: 相似度阈值
+        report_metadata: 可选，{报告标题: 元数据}，见 parse_report_list
+        
+    Returns:
+        list: 被引用报告的搜索结果（与 search_single_report 格式相同），按引用次数降序
+    """
+    corpus = _ensure_corpus(scopus_df)
+    report_metadata = report_metadata or {}
+    report_titles = list(dict.fromkeys(report_titles))
+    processed_titles = preprocess_titles(report_titles)
+    report_years = {title: (report_metadata.get(title) or {}).get('year') for title in report_titles}
+    
+    # 报告的 DOI/URL 键 -> 报告标题
+    key_reports = {}
+    for title in report_titles:
+        for key in report_identifier_keys(report_metadata.get(title)):
+            key_reports.setdefault(key, set()).add(title)
+    
+    rows = select_rows_by_paper_ids(corpus, citing_paper_ids)
+    reference_text = _take(corpus['reference_text'], rows)
+    reference_normalized = _take(corpus['reference_normalized'], rows)
+    reference_span = _take(corpus['reference_span'], rows)
+    reference_valid = corpus['reference_valid'][rows]
+    reference_year = corpus['reference_year'][rows]
+    citing_year = corpus['citing_year'][rows]
+    
+    scored = {}
+    for i, idx in enumerate(rows):
+        keyed = set()
+        if key_reports:
+            for key in extract_identifiers(reference_text[i]):
+                keyed.update(key_reports.get(key, ()))
+        
+        for title in report_titles:
+            if title in keyed:
+                scored.setdefault(title, []).append((idx, True, False, 0.0, 0.0))
+                continue
+            
+            title_data = processed_titles.get(title)
+            if title_data is None or not reference_valid[i]:
+                continue
+            if report_years[title] and not _year_feasible(reference_year[i], citing_year[i], report_years[title]):
+                continue
+            
+            exact, similarity, overlap_ratio = _score_normalized(reference_normalized[i], title_data,
+                                                                 reference_span[i], min_score=threshold)
+            if exact or similarity >= threshold or overlap_ratio >= 70:
+                scored.setdefault(title, []).append((idx, False, exact, similarity, overlap_ratio))
+    
+    results = [apply_threshold(_score_table(title, threshold, *zip(*scored[title])), corpus, threshold)
+               for title in report_titles if title in scored]
+    return sorted(results, key=lambda r: r['citation_count'], reverse=True)
+
+
 def load_data_with_encoding(file_path):
     """
     尝试多种编码方式加载CSV文件
@@ -186,3 +1552,273 @@ def load_data_with_encoding(file_path):
             continue
     
     raise ValueError(f"无法读取文件 {file_path}，尝试了所有常见编码方式")
+
+
+# 聚合维度：显示名称 -> regions数据中的列名
+AGGREGATE_DIMENSIONS = {
+    'Country': 'Country (First Author)',
+    'Region': 'Region',
+    'Year': 'Year',
+    'Source Title': 'Source title'
+}
+
+
+def count_exact_citations(matches):
+    """匹配表中的精确引用数（DOI/URL 命中或直接包含，见 EXACT_METHODS）"""
+    exact_codes = [MATCH_METHODS.index(method) for method in EXACT_METHODS]
+    return int(np.count_nonzero(np.isin(matches['method'], exact_codes)))
+
+
+def matches_to_table(matches):
+    """
+    将匹配表转换为不含文本的DataFrame，便于向量化分组统计
+    
+    Args:
+        matches: search_single_report 返回的 'matches' 匹配表
+        
+    Returns:
+        pd.DataFrame: paper_id (int64)、similarity_score (float32)、match_method (category) 三列
+    """
+    return pd.DataFrame({
+        'paper_id': matches['paper_id'],
+        'similarity_score': matches['similarity_score'],
+        'match_method': pd.Categorical.from_codes(matches['method'], categories=MATCH_METHODS)
+    })
+
+
+def match_frame(matches, scopus_df):
+    """
+    读取匹配表对应的引用文本，生成完整的匹配明细（用于显示和导出）
+    
+    Args:
+        matches: search_single_report 返回的 'matches' 匹配表
+        scopus_df: 搜索时使用的语料库
+        
+    Returns:
+        pd.DataFrame: paper_id、citing_paper、reference_text、similarity_score、match_method 五列
+    """
+    corpus = _ensure_corpus(scopus_df)
+    table = matches_to_table(matches)
+    table.insert(1, 'citing_paper', _take(corpus['citing_paper'], matches['row_id']))
+    table.insert(2, 'reference_text', _take(corpus['reference_text'], matches['row_id']))
+    return table
+
+
+def aggregate_matches(match_table, regions_df, dimensions=None):
+    """
+    按国家、地区、年份、期刊等维度汇总匹配结果
+    
+    匹配表按论文ID与regions数据做一次连接，之后每个维度只是一次 groupby。
+    
+    Args:
+        match_table: matches_to_table 生成的列式匹配表
+        regions_df: 带 'paper_id' 列的regions数据
+        dimensions: 可选，{显示名称: 列名}，默认 AGGREGATE_DIMENSIONS
+        
+    Returns:
+        dict: 显示名称 -> DataFrame（维度值、Citations、Papers、Average Similarity）；
+              年份按时间排序，其余按引用次数降序。regions数据中不存在的维度会被跳过
+    """
+    if regions_df is None or 'paper_id' not in regions_df.columns or match_table.empty:
+        return {}
+    
+    dimensions = AGGREGATE_DIMENSIONS if dimensions is None else dimensions
+    columns = {}
+    for name, column_name in dimensions.items():
+        col = _find_column(regions_df, column_name.lower())
+        if col is not None:
+            columns[name] = col
+    if not columns:
+        return {}
+    
+    attributes = regions_df[['paper_id', *columns.values()]].drop_duplicates('paper_id')
+    joined = match_table.merge(attributes, on='paper_id', how='left')
+    
+    aggregates = {}
+    for name, col in columns.items():
+        grouped = joined.groupby(col).agg(
+            Citations=('paper_id', 'size'),
+            Papers=('paper_id', 'nunique'),
+            **{'Average Similarity': ('similarity_score', 'mean')}
+        )
+        grouped['Average Similarity'] = grouped['Average Similarity'].astype(float).round(2)
+        grouped.index.name = name
+        if name == 'Year':
+            grouped = grouped.sort_index()
+        else:
+            grouped = grouped.sort_values('Citations', ascending=False, kind='stable')
+        aggregates[name] = grouped.reset_index()
+    
+    return aggregates
+
+
+def _paper_attribute(regions_df, column_name):
+    """论文ID -> regions数据中某列的值（每篇论文取第一次出现的行）"""
+    if regions_df is None or 'paper_id' not in regions_df.columns:
+        return pd.Series(dtype=object)
+    col = _find_column(regions_df, column_name.lower())
+    if col is None:
+        return pd.Series(dtype=object)
+    values = regions_df[[col, 'paper_id']].drop_duplicates('paper_id').dropna()
+    return pd.Series(values[col].to_numpy(), index=values['paper_id'].to_numpy())
+
+
+def _count_by_attribute(paper_ids, lookup):
+    """按论文属性统计引用次数，键统一为字符串以便保存为JSON"""
+    values = lookup.reindex(paper_ids).dropna()
+    counts = Counter(str(int(v)) if isinstance(v, (int, float, np.integer, np.floating)) else str(v).strip()
+                     for v in values)
+    return dict(counts.most_common())
+
+
+def build_citation_leaderboard(report_titles, scopus_df, regions_df=None, threshold=85, progress_callback=None,
+                               report_metadata=None, checkpoint_dir=None):
+    """
+    预计算整个报告目录的引用排行榜
+    
+    逐个报告搜索并立即汇总为计数（按匹配方式、年份、国家），不保留匹配明细，
+    因此可以一次处理全部约500个报告。另外保存引用每个报告的论文ID，用于共被引分析
+    （见 build_cocitation_matrix）。提供 checkpoint_dir 时每个报告的统计写入检查点，
+    中断后重新运行会跳过已完成的报告（见 open_checkpoint）。
+    
+    Args:
+        report_titles: 报告标题列表
+        scopus_df: Scopus引用数据DataFrame，或 build_reference_corpus 构建的语料库
+        regions_df: 可选，带 'paper_id' 列的regions数据，用于按年份和国家统计
+        threshold: 相似度阈值
+        progress_callback: 进度回调函数
+        report_metadata: 可选，{标题: 元数据字典}，见 parse_report_list
+        checkpoint_dir: 可选，检查点文件所在目录
+        
+    Returns:
+        dict: 排行榜，包含生成参数和每个报告的统计
+    """
+    corpus = _ensure_corpus(scopus_df)
+    years = _paper_attribute(regions_df, 'Year')
+    countries = _paper_attribute(regions_df, 'Country (First Author)')
+    
+    reports = []
+    total = len(report_titles)
+    report_metadata = report_metadata or {}
+    
+    checkpoint = None
+    if checkpoint_dir:
+        # 按年份/国家的统计依赖regions数据，其内容也参与检查点命名
+        regions_digest = _corpus_fingerprint(pd.concat([years.rename('year'), countries.rename('country')], axis=1)
+                                             .reset_index().astype(str))
+        checkpoint = open_checkpoint(checkpoint_dir, 'leaderboard', corpus, threshold=threshold,
+                                     regions=regions_digest)
+    
+    for i, title in enumerate(report_titles, 1):
+        if checkpoint is not None:
+            entry = checkpoint['done'].get(_checkpoint_key(title, report_metadata.get(title)))
+            if entry is not None:
+                reports.append(entry)
+                if progress_callback:
+                    progress_callback(i, total, entry)
+                continue
+        
+        result = search_single_report(title, corpus, threshold, report_meta=report_metadata.get(title))
+        paper_ids = result['matches']['paper_id'].tolist()
+        reports.append({
+            'report_title': result['report_title'],
+            'citation_count': result['citation_count'],
+            'exact_citations': count_exact_citations(result['matches']),
+            'average_similarity': float(result['average_similarity']),
+            'match_methods': result['match_methods'],
+            'by_year': _count_by_attribute(paper_ids, years),
+            'by_country': _count_by_attribute(paper_ids, countries),
+            'paper_ids': sorted(set(paper_ids))
+        })
+        if checkpoint is not None:
+            append_checkpoint(checkpoint, title, report_metadata.get(title), reports[-1])
+        
+        if progress_callback:
+            progress_callback(i, total, result)
+    
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'threshold': threshold,
+        'matching_version': MATCHING_VERSION,
+        'corpus_fingerprint': corpus['fingerprint'],
+        'corpus_size': corpus['size'],
+        'reports': reports
+    }
+
+
+def build_cocitation_matrix(report_paper_ids):
+    """
+    计算报告之间的共被引次数：两个报告被同一篇论文同时引用的论文数
+    
+    先构建稀疏的 论文 × 报告 关联矩阵 A（论文引用报告为1），
+    共被引矩阵即 A.T @ A，对角线为引用该报告的论文数。
+    
+    Args:
+        report_paper_ids: {报告标题: 引用论文ID列表}，例如由批量搜索结果的
+                          matches 或排行榜的 'paper_ids' 得到
+        
+    Returns:
+        dict: 'report_titles'（矩阵行列顺序）、'paper_ids'（关联矩阵的行）、
+              'incidence'（论文 × 报告，CSR）、'cocitation'（报告 × 报告，CSR）
+    """
+    # scipy 只有共被引分析用到，延迟导入以加快启动
+    from scipy import sparse
+    
+    report_titles = list(report_paper_ids)
+    per_report = [np.unique(np.asarray(report_paper_ids[t], dtype=np.int64)) for t in report_titles]
+    report_index = np.repeat(np.arange(len(report_titles)), [len(ids) for ids in per_report])
+    all_ids = np.concatenate(per_report) if per_report else np.zeros(0, dtype=np.int64)
+    paper_ids, paper_index = np.unique(all_ids, return_inverse=True)
+    
+    incidence = sparse.csr_matrix((np.ones(len(all_ids), dtype=np.int32), (paper_index, report_index)),
+                                  shape=(len(paper_ids), len(report_titles)))
+    return {
+        'report_titles': report_titles,
+        'paper_ids': paper_ids,
+        'incidence': incidence,
+        'cocitation': (incidence.T @ incidence).tocsr()
+    }
+
+
+def top_cocitation_pairs(cocitation_data, top_n=20):
+    """
+    共被引次数最多的报告对
+    
+    Args:
+        cocitation_data: build_cocitation_matrix 的结果
+        top_n: 返回的报告对数量
+        
+    Returns:
+        pd.DataFrame: 'report_a'、'report_b'、'co_citing_papers'、'jaccard'（共同引用论文占两者引用论文并集的比例），
+                      按共被引次数降序
+    """
+    from scipy import sparse
+    
+    titles = cocitation_data['report_titles']
+    cocitation = cocitation_data['cocitation']
+    pairs = sparse.triu(cocitation, k=1).tocoo()
+    order = np.lexsort((pairs.col, pairs.row, -pairs.data))[:top_n]
+    rows, cols, counts = pairs.row[order], pairs.col[order], pairs.data[order]
+    cited = cocitation.diagonal()
+    return pd.DataFrame({
+        'report_a': [titles[i] for i in rows],
+        'report_b': [titles[j] for j in cols],
+        'co_citing_papers': counts.astype(np.int64),
+        'jaccard': np.round(counts / (cited[rows] + cited[cols] - counts), 3) if len(counts) else np.zeros(0)
+    })
+
+
+def save_leaderboard(leaderboard, file_path):
+    """保存排行榜（先写临时文件再替换，避免应用读到半个文件）"""
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(leaderboard, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, file_path)
+
+
+def load_leaderboard(file_path):
+    """读取预计算的排行榜，文件不存在时返回None"""
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+本地 SQLite 存储（单个文件，无需服务器）
+保存引用语料库（引用文本、标准化文本、标题片段、DOI/URL索引）和论文元数据，
+并为引用文本和论文 Title/Abstract 建立 FTS5 全文索引。
+
+应用启动时只把数值列（论文ID、年份）读入内存，文本按需分块读取，
+内存占用有上限、冷启动快；多个 Streamlit 进程可以同时只读打开同一个文件。
+全文索引用于两处候选检索：报告标题 -> 可能匹配的引用行（见 score_report），
+关键词 -> 可能命中的论文（见 app.search_papers_by_keywords），
+最终结果仍由原有的打分/正则规则确认。
+
+引用的候选检索按词前缀进行，与报告标题不共享任何词前缀的模糊匹配会被漏掉。这类匹配
+的相似度多在 70–84 之间，但个别报告在 70 时会漏掉大部分引用，因此只在阈值不低于
+STORE_EXACT_THRESHOLD 时使用候选检索，更低的阈值扫描全部行（见 score_report）。
+存储语料库使用单独的指纹，与全量扫描的结果不共用缓存和检查点。--check 对比
+候选检索与全量扫描的结果。
+
+用法:
+    python citation_store.py
+    python citation_store.py --output citation_store.db
+    python citation_store.py --check --thresholds 70 85
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from functools import partial
+
+import numpy as np
+
+import pandas as pd
+
+from citation_search_engine import (
+    MATCHING_VERSION,
+    _file_fingerprint,
+    _find_column,
+    _read_only,
+    apply_threshold,
+    load_preloaded_data,
+    parse_report_list,
+    score_report
+)
+
+# 存储格式版本：表结构改变时加一
+STORE_VERSION = 1
+# 检索报告标题时忽略的常见词（几乎每条引用都包含，无法缩小候选范围）
+STORE_STOPWORDS = frozenset({
+    'and', 'for', 'the', 'with', 'from', 'into', 'its', 'their', 'our', 'are', 'how', 'what', 'why', 'new'
+})
+# 可用于全文检索的词少于此数时不做候选检索
+STORE_MIN_TERMS = 2
+# 在此阈值及以上，候选检索不应改变任何报告的引用数（--check 的通过标准）；
+# 低于此阈值的搜索不使用候选检索
+STORE_EXACT_THRESHOLD = 85
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE reference_rows (
+    row_id INTEGER PRIMARY KEY,
+    paper_id INTEGER NOT NULL,
+    citing_paper TEXT,
+    reference_text TEXT,
+    reference_normalized TEXT NOT NULL,
+    reference_span TEXT NOT NULL,
+    reference_year INTEGER NOT NULL,
+    citing_year INTEGER NOT NULL,
+    valid INTEGER NOT NULL,
+    normalized_length INTEGER NOT NULL
+);
+CREATE TABLE identifiers (key TEXT NOT NULL, row_id INTEGER NOT NULL);
+CREATE VIRTUAL TABLE reference_fts USING fts5(
+    reference_normalized, content='reference_rows', content_rowid='row_id'
+);
+CREATE TABLE papers (regions_row INTEGER PRIMARY KEY, paper_id INTEGER NOT NULL, title TEXT, abstract TEXT);
+CREATE VIRTUAL TABLE papers_fts USING fts5(title, abstract, content='papers', content_rowid='regions_row');
+"""
+
+_connections = threading.local()
+
+
+def _connect(db_path):
+    """每个线程一个只读连接（Streamlit 每个会话在各自的线程中运行）"""
+    cache = getattr(_connections, 'by_path', None)
+    if cache is None:
+        cache = _connections.by_path = {}
+    conn = cache.get(db_path)
+    if conn is None:
+        uri = f"file:{os.path.abspath(db_path)}?mode=ro"
+        conn = cache[db_path] = sqlite3.connect(uri, uri=True)
+    return conn
+
+
+def _source_fingerprint(source_paths):
+    return ';'.join(_file_fingerprint(p) for p in source_paths)
+
+
+def _text_or_none(value):
+    return None if value is None or value != value else str(value)
+
+
+def build_store(corpus, db_path, regions_df=None, source_paths=()):
+    """
+    将语料库（以及可选的regions论文数据）写入 SQLite 文件
+
+    先写入临时文件再替换，正在读取旧文件的进程不受影响。
+
+    Args:
+        corpus: build_reference_corpus 构建的语料库
+        db_path: 输出文件路径
+        regions_df: 可选，load_regions_data 加载的regions数据（用于关键词筛选）
+        source_paths: 生成语料库所用的数据文件，其变化会使存储过期（见 store_is_current）
+    """
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(_SCHEMA)
+        rows = zip(range(corpus['size']), corpus['paper_id'].tolist(), corpus['citing_paper'],
+                   corpus['reference_text'], corpus['reference_normalized'], corpus['reference_span'],
+                   corpus['reference_year'].tolist(), corpus['citing_year'].tolist(),
+                   corpus['reference_valid'].tolist())
+        conn.executemany("INSERT INTO reference_rows VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         ((row_id, paper_id, _text_or_none(citing), _text_or_none(text), normalized, *rest,
+                           len(normalized))
+                          for row_id, paper_id, citing, text, normalized, *rest in rows))
+        conn.executemany("INSERT INTO identifiers VALUES (?, ?)",
+                         ((key, int(row_id)) for key, row_ids in corpus['identifier_index'].items()
+                          for row_id in row_ids))
+        conn.execute("CREATE INDEX identifiers_key ON identifiers (key)")
+        conn.execute("INSERT INTO reference_fts (reference_fts) VALUES ('rebuild')")
+
+        if regions_df is not None:
+            abstract_col = _find_column(regions_df, 'abstract')
+            abstracts = regions_df[abstract_col] if abstract_col is not None else [None] * len(regions_df)
+            conn.executemany("INSERT INTO papers VALUES (?, ?, ?, ?)",
+                             ((i, int(paper_id), _text_or_none(title), _text_or_none(abstract))
+                              for i, (paper_id, title, abstract) in
+                              enumerate(zip(regions_df['paper_id'], regions_df['Title'], abstracts))))
+            conn.execute("INSERT INTO papers_fts (papers_fts) VALUES ('rebuild')")
+
+        meta = {
+            'store_version': STORE_VERSION,
+            'matching_version': MATCHING_VERSION,
+            'fingerprint': corpus['fingerprint'],
+            'size': corpus['size'],
+            'papers': 0 if regions_df is None else len(regions_df),
+            'sources': _source_fingerprint(source_paths),
+        }
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", ((k, json.dumps(v)) for k, v in meta.items()))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+
+
+def read_store_meta(db_path):
+    """读取存储的元数据，文件不存在或格式不符时返回 None"""
+    try:
+        conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+        try:
+            return {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+def store_is_current(db_path, source_paths):
+    """存储是否与当前数据文件和匹配规则一致"""
+    meta = read_store_meta(db_path)
+    try:
+        return meta is not None and meta['store_version'] == STORE_VERSION \
+            and meta['matching_version'] == MATCHING_VERSION \
+            and meta['sources'] == _source_fingerprint(source_paths)
+    except (KeyError, OSError):
+        return False
+
+
+class StoreColumn:
+    """按需读取的文本列：支持 len()、下标访问和批量 take()"""
+
+    def __init__(self, db_path, column, size):
+        self.db_path = db_path
+        self.column = column
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, row_id):
+        return self.take([row_id])[0]
+
+    def __iter__(self):
+        for start in range(0, self.size, 10000):
+            yield from self.take(range(start, min(start + 10000, self.size)))
+
+    def take(self, rows):
+        query = (f"SELECT r.{self.column} FROM json_each(?) j "
+                 f"JOIN reference_rows r ON r.row_id = j.value ORDER BY j.key")
+        rows = json.dumps([int(row_id) for row_id in rows])
+        return [value for value, in _connect(self.db_path).execute(query, (rows,))]
+
+
+class StoreIdentifierIndex:
+    """DOI/URL 索引：与内存语料库的 identifier_index 一样支持 get(key, default)"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def get(self, key, default=None):
+        rows = [row_id for row_id, in _connect(self.db_path).execute(
+            "SELECT row_id FROM identifiers WHERE key = ? ORDER BY row_id", (key,))]
+        return _read_only(np.array(rows, dtype=np.int64)) if rows else default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+def _fts_term(term):
+    """转义为 FTS5 字符串（双引号内的双引号写两次）"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _term_prefix(word):
+    """检索用的词前缀：保留约 60% 的字符（至少4个），覆盖 sector/sectors、interlinking/interlinkages 等词形"""
+    return word[:max(4, -(-len(word) * 3 // 5))]
+
+
+def store_candidate_rows(db_path, reference_length, title_normalized):
+    """
+    用引用文本的全文索引检索可能匹配报告标题的行
+
+    任一非常见词（3个字符以上，按词前缀匹配以覆盖词形变化，见 _term_prefix）出现即为候选。
+    比标题短的引用在模糊匹配中作为被查找的一方，不一定与标题共享完整的词，
+    因此全部保留。可用词少于 STORE_MIN_TERMS 个时（单词标题可能出现在其他词内部）
+    返回 None，由调用方扫描全部行。
+    
+    候选不是匹配的超集：较长的引用可能只靠字符层面的相似（不共享任何词前缀）达到
+    模糊匹配阈值，这类行不在候选中。它们的相似度多低于 STORE_EXACT_THRESHOLD，
+    语料库的 'candidate_threshold' 因此设为该值，更低的阈值不使用候选（见 compare_store_results）。
+
+    Args:
+        db_path: 存储文件路径
+        reference_length: 每行标准化引用文本的长度
+        title_normalized: 标准化后的报告标题
+
+    Returns:
+        np.ndarray 或 None: 候选行号
+    """
+    terms = sorted({w for w in title_normalized.split() if len(w) >= 3 and w not in STORE_STOPWORDS})
+    if len(terms) < STORE_MIN_TERMS:
+        return None
+    query = ' OR '.join(_fts_term(_term_prefix(w)) + '*' for w in terms)
+    rows = _connect(db_path).execute("SELECT rowid FROM reference_fts WHERE reference_fts MATCH ?", (query,))
+    hits = np.fromiter((row_id for row_id, in rows), dtype=np.int64)
+    return np.union1d(hits, np.flatnonzero(reference_length < len(title_normalized)))
+
+
+def store_keyword_candidates(db_path, all_variants, operator):
+    """
+    用论文 Title/Abstract 的全文索引检索可能命中关键词的regions数据行
+
+    每个关键词的任一变体命中即视为该关键词命中，关键词之间按 operator 组合。
+    全文索引的分词比应用的正则宽松，结果是正则筛选结果的超集。
+
+    Args:
+        db_path: 存储文件路径
+        all_variants: 每个关键词的变体集合列表
+        operator: 'AND'、'OR' 或 'PHRASE'
+
+    Returns:
+        np.ndarray 或 None: regions数据行号（存储中没有论文数据时返回 None）
+    """
+    meta = read_store_meta(db_path)
+    if not meta or not meta.get('papers'):
+        return None
+    joiner = ' OR ' if operator == 'OR' else ' AND '
+    query = joiner.join('(' + ' OR '.join(_fts_term(v) for v in sorted(variants)) + ')'
+                        for variants in all_variants)
+    try:
+        rows = _connect(db_path).execute("SELECT rowid FROM papers_fts WHERE papers_fts MATCH ?", (query,)).fetchall()
+    except sqlite3.OperationalError:
+        # 变体中没有可检索的词（例如只有标点），交给正则全量筛选
+        return None
+    return np.fromiter((row_id for row_id, in rows), dtype=np.int64)
+
+
+def open_store_corpus(db_path):
+    """
+    打开存储，返回与 build_reference_corpus 结构相同的语料库
+
+    数值列读入内存（只读），文本列和DOI/URL索引按需从文件读取，
+    'df' 为 None。语料库带有 'candidate_rows'，阈值不低于 'candidate_threshold'
+    （STORE_EXACT_THRESHOLD）时 score_report 只对全文索引候选打分。
+    候选检索的结果只在该阈值经 --check 验证，因此 'fingerprint' 与同一数据的内存语料库不同
+    （评分表缓存、检查点等不混用两者的结果）；'data_fingerprint' 为数据本身的指纹，
+    用于判断全量扫描的预计算结果（排行榜）是否与数据一致。
+
+    Args:
+        db_path: 存储文件路径
+
+    Returns:
+        dict: 语料库
+    """
+    meta = read_store_meta(db_path)
+    if meta is None:
+        raise ValueError(f"'{os.path.basename(db_path)}' 不是有效的引用存储文件")
+
+    size = meta['size']
+    conn = _connect(db_path)
+    numeric = np.array(conn.execute(
+        "SELECT paper_id, reference_year, citing_year, valid, normalized_length FROM reference_rows "
+        "ORDER BY row_id").fetchall(), dtype=np.int64).reshape(-1, 5)
+    reference_length = _read_only(numeric[:, 4].astype(np.int32))
+
+    return {
+        'df': None,
+        'size': size,
+        'fingerprint': f"{meta['fingerprint']}+fts{STORE_VERSION}",
+        'data_fingerprint': meta['fingerprint'],
+        'identifier_index': StoreIdentifierIndex(db_path),
+        'reference_text': StoreColumn(db_path, 'reference_text', size),
+        'citing_paper': StoreColumn(db_path, 'citing_paper', size),
+        'reference_normalized': StoreColumn(db_path, 'reference_normalized', size),
+        'reference_length': reference_length,
+        'reference_span': StoreColumn(db_path, 'reference_span', size),
+        'reference_valid': _read_only(numeric[:, 3].astype(bool)),
+        'paper_id': _read_only(numeric[:, 0].copy()),
+        'paper_order': _read_only(np.argsort(numeric[:, 0], kind='stable')),
+        'reference_year': _read_only(numeric[:, 1].astype(np.int16)),
+        'citing_year': _read_only(numeric[:, 2].astype(np.int16)),
+        'candidate_rows': partial(store_candidate_rows, db_path, reference_length),
+        'candidate_threshold': STORE_EXACT_THRESHOLD,
+    }
+
+
+def compare_store_results(store_corpus, corpus, report_titles, thresholds, report_metadata=None):
+    """
+    对比存储语料库（全文索引候选）与内存语料库（全量扫描）的每个报告引用数
+
+    每个报告在最低的阈值处各打分一次，再按每个阈值筛选；存储一方在所有阈值都使用
+    候选检索（应用在 STORE_EXACT_THRESHOLD 以下不使用），以衡量候选检索本身漏掉的匹配。
+
+    Args:
+        store_corpus: open_store_corpus 打开的语料库
+        corpus: 同一数据构建的内存语料库
+        report_titles: 报告标题列表
+        thresholds: 相似度阈值列表
+        report_metadata: 可选，{标题: 元数据字典}，见 parse_report_list
+
+    Returns:
+        dict: {阈值: [(报告标题, 存储引用数, 全量扫描引用数)]}，只列出引用数不同的报告
+    """
+    report_metadata = report_metadata or {}
+    floor = min(thresholds)
+    differences = {threshold: [] for threshold in thresholds}
+    for title in report_titles:
+        meta = report_metadata.get(title)
+        store_table = score_report(title, store_corpus, min_threshold=floor, report_meta=meta, use_candidates=True)
+        full_table = score_report(title, corpus, min_threshold=floor, report_meta=meta)
+        for threshold in thresholds:
+            store_count = apply_threshold(store_table, store_corpus, threshold)['citation_count']
+            full_count = apply_threshold(full_table, corpus, threshold)['citation_count']
+            if store_count != full_count:
+                differences[threshold].append((title, store_count, full_count))
+    return differences
+
+
+def check_store(db_path, corpus, reports_path, thresholds):
+    """打印存储与全量扫描的对比结果；STORE_EXACT_THRESHOLD 及以上的阈值有差异时返回 False"""
+    report_titles, report_metadata = parse_report_list(pd.read_csv(reports_path))
+    print(f"对比 {len(report_titles)} 个报告（阈值 {', '.join(map(str, thresholds))}）...")
+    differences = compare_store_results(open_store_corpus(db_path), corpus, report_titles, thresholds,
+                                        report_metadata)
+    passed = True
+    for threshold in sorted(differences):
+        rows = differences[threshold]
+        exact = threshold >= STORE_EXACT_THRESHOLD
+        passed &= not (exact and rows)
+        mark = '✅' if not rows else ('❌' if exact else 'ℹ️')
+        note = '' if exact else '（应用在此阈值扫描全部行，不使用候选检索）'
+        print(f"{mark} 阈值 {threshold}: {len(rows)} 个报告的引用数不同{note}")
+        for title, store_count, full_count in rows[:10]:
+            print(f"   {title[:60]}: 存储 {store_count} / 全量扫描 {full_count}")
+    return passed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="构建引用数据的 SQLite 存储")
+    parser.add_argument('--scopus', default="Complete_References_Scopus_FULL.csv", help="Scopus引用数据文件")
+    parser.add_argument('--regions', default="all reference with regions.csv", help="regions数据文件")
+    parser.add_argument('--output', default="citation_store.db", help="存储输出文件")
+    parser.add_argument('--check', action='store_true',
+                        help=f"对比存储与全量扫描的引用数（存储过期时先重建），阈值不低于 "
+                             f"{STORE_EXACT_THRESHOLD} 时有差异则失败")
+    parser.add_argument('--reports', default="UNEP FI Reports Title.csv", help="--check 使用的报告列表文件")
+    parser.add_argument('--thresholds', type=int, nargs='+', default=[70, STORE_EXACT_THRESHOLD],
+                        help="--check 对比的相似度阈值")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    start = time.time()
+    print("加载数据...")
+    if not os.path.exists(args.scopus) and os.path.exists(args.regions):
+        print(f"ℹ️ 未找到 {args.scopus}，使用 {args.regions} 中的 References 列")
+    try:
+        corpus, regions_df, source_paths = load_preloaded_data(args.scopus, args.regions)
+    except FileNotFoundError as e:
+        print(f"❌ 文件不存在: {e.filename}")
+        return 1
+
+    if not args.check or not store_is_current(args.output, source_paths):
+        print(f"写入 {corpus['size']:,} 条引用...")
+        build_store(corpus, args.output, regions_df, source_paths)
+        print(f"✅ 存储已保存到 {args.output}（用时 {time.time() - start:.1f}s）")
+    if args.check:
+        if not os.path.exists(args.reports):
+            print(f"❌ 文件不存在: {args.reports}")
+            return 1
+        return 0 if check_store(args.output, corpus, args.reports, args.thresholds) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+并发会话压力测试
+用 Streamlit 的测试工具（AppTest，无需网络和浏览器）在同一进程中模拟 N 个分析人员同时使用应用：
+每个会话反复执行关键词筛选、单个报告搜索和批量搜索。数据为按参数生成的合成数据，
+所有会话共享进程内缓存（与一个 Streamlit 服务器进程相同）。
+
+AppTest 使用进程全局的运行时，不能并行执行脚本，因此各会话交替运行、同一时刻只运行
+一个页面。应用的搜索是持有 GIL 的 CPU 密集型 Python 代码，真实服务器上并发会话的
+吞吐量与此接近。每个操作记录两种时间：响应时间（含等待其他会话的排队时间）和
+服务时间（页面本身的运行时间）。
+
+输出每类操作的延迟分位数、总吞吐量，以及进程内存（RSS）的增长（总量和按会话平均）。
+
+用法:
+    python load_test.py --sessions 8 --iterations 3
+    python load_test.py --sessions 16 --papers 20000 --references-per-paper 30 --batch-size 10
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+# 与 app.py 中的预置文件名一致
+REGIONS_FILE = "all reference with regions.csv"
+SCOPUS_FILE = "Complete_References_Scopus_FULL.csv"
+REPORTS_FILE = "UNEP FI Reports Title.csv"
+
+TOPICS = ['climate', 'risk', 'banking', 'insurance', 'ocean', 'finance', 'biodiversity', 'investment', 'disclosure',
+          'transition', 'adaptation', 'carbon', 'sustainable', 'governance', 'nature', 'water', 'energy', 'policy']
+FILLER = ['analysis', 'framework', 'evidence', 'impact', 'assessment', 'markets', 'approach', 'study', 'global',
+          'emerging', 'corporate', 'portfolio', 'regional', 'effects', 'model', 'review', 'capital', 'guidance']
+COUNTRIES = [('China', 'Asia'), ('United States', 'North America'), ('United Kingdom', 'Europe'),
+             ('Germany', 'Europe'), ('Brazil', 'South America'), ('Kenya', 'Africa'), ('Australia', 'Oceania')]
+KEYWORD_QUERIES = ['climate risk', 'banking', 'ocean AND finance', 'biodiversity', 'insurance OR water',
+                   'carbon', 'sustainable investment', 'adaptation']
+
+# AppTest 不能并行运行脚本，所有会话的页面运行依次获取此锁
+RUN_LOCK = threading.Lock()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="模拟多个并发会话，测量应用的延迟、吞吐量和内存增长")
+    parser.add_argument('--sessions', type=int, default=8, help="并发会话数")
+    parser.add_argument('--iterations', type=int, default=3, help="每个会话重复工作流程的次数")
+    parser.add_argument('--papers', type=int, default=3000, help="合成数据中的论文数")
+    parser.add_argument('--references-per-paper', type=int, default=20, help="每篇论文的引用数")
+    parser.add_argument('--reports', type=int, default=200, help="合成报告列表中的报告数")
+    parser.add_argument('--batch-size', type=int, default=5, help="每次批量搜索的报告数")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--data-dir', help="合成数据目录（默认使用临时目录，结束后删除）")
+    parser.add_argument('--timeout', type=float, default=600, help="单次页面运行的超时（秒）")
+    return parser.parse_args()
+
+
+def _phrase(rng, low, high):
+    words = [rng.choice(TOPICS if rng.random() < 0.4 else FILLER) for _ in range(rng.randint(low, high))]
+    return ' '.join(words).capitalize()
+
+
+def generate_synthetic_data(data_dir, papers, references_per_paper, reports, seed=0):
+    """
+    在 data_dir 中生成合成的 regions 数据、Scopus 引用长表和报告列表（文件名与预置数据相同）
+    约 5% 的引用直接或稍加改动地引用某个报告，其余为随机文献
+    """
+    rng = random.Random(seed)
+    report_titles = list(dict.fromkeys(_phrase(rng, 5, 12) for _ in range(reports)))
+
+    rows = []
+    for i in range(papers):
+        references = []
+        for _ in range(references_per_paper):
+            year = rng.randint(2000, 2024)
+            if rng.random() < 0.05:
+                title = rng.choice(report_titles)
+                if rng.random() < 0.3:
+                    # 引用中的标题有拼写差异或被截断
+                    title = title[:max(20, int(len(title) * 0.8))]
+                references.append(f"UNEP FI, {title}, ({year})")
+            else:
+                references.append(f"{rng.choice(FILLER).capitalize()} A., {_phrase(rng, 4, 10)}, "
+                                  f"Journal of {rng.choice(TOPICS).capitalize()}, {rng.randint(1, 40)}, ({year})")
+        country, region = rng.choice(COUNTRIES)
+        rows.append({
+            'Title': f"{_phrase(rng, 6, 14)} {i}",
+            'First author': f"Author {i}",
+            'Year': rng.randint(2015, 2025),
+            'Source title': f"Journal of {rng.choice(TOPICS).capitalize()}",
+            'Cited by': rng.randint(0, 200),
+            'DOI': f"10.9999/synthetic.{i}",
+            'Country (First Author)': country,
+            'Region': region,
+            'Abstract': ' '.join(_phrase(rng, 8, 16) + '.' for _ in range(3)),
+            'References': '; '.join(references)
+        })
+
+    regions_df = pd.DataFrame(rows)
+    regions_df.to_csv(os.path.join(data_dir, REGIONS_FILE), index=False)
+    scopus_df = regions_df[['Title', 'References']].assign(Reference=regions_df['References'].str.split('; '))
+    scopus_df[['Title', 'Reference']].explode('Reference').to_csv(os.path.join(data_dir, SCOPUS_FILE), index=False)
+    pd.DataFrame({'UNEP FI Reports Title': report_titles}).to_csv(os.path.join(data_dir, REPORTS_FILE), index=False)
+    return report_titles
+
+
+def current_rss():
+    """当前进程的常驻内存（字节）；没有 /proc 时退回到历史峰值"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _find(elements, predicate):
+    return next(e for e in elements if predicate(e))
+
+
+def run_session(session_index, args, report_titles, timings, errors):
+    """一个会话：打开页面后循环执行 关键词筛选 -> 单个报告搜索 -> 批量搜索"""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(args.seed * 1000 + session_index)
+
+    def timed(action, at):
+        """运行页面，记录 (操作, 响应时间, 服务时间)"""
+        requested = time.perf_counter()
+        with RUN_LOCK:
+            started = time.perf_counter()
+            at.run(timeout=args.timeout)
+        finished = time.perf_counter()
+        timings.append((action, finished - requested, finished - started))
+        if at.exception:
+            errors.append(f"会话 {session_index} {action}: {at.exception[0].value}")
+
+    def run(at):
+        with RUN_LOCK:
+            at.run(timeout=args.timeout)
+
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    timed('open', at)
+    _find(at.sidebar.radio, lambda r: r.label == "Choose source:").set_value("📋 Use pre-loaded UNEP FI list")
+    timed('open', at)
+
+    for _ in range(args.iterations):
+        at.text_input[0].input(rng.choice(KEYWORD_QUERIES))
+        _find(at.button, lambda b: 'Apply Filter' in b.label).click()
+        timed('keyword_filter', at)
+
+        database = [r for r in at.radio if r.label.startswith('**Select citation database')]
+        if database:
+            database[0].set_value(rng.choice(database[0].options))
+        _find(at.radio, lambda r: r.label == '**Search Mode**').set_value("🔍 Single Report Search")
+        run(at)
+        _find(at.selectbox, lambda s: s.label == "Select report from list").set_value(rng.choice(report_titles))
+        _find(at.button, lambda b: 'Search Citations' in b.label).click()
+        timed('single_search', at)
+
+        _find(at.radio, lambda r: r.label == '**Search Mode**').set_value("📊 Batch Report Search")
+        run(at)
+        _find(at.multiselect, lambda m: m.label.startswith("Select multiple reports")).set_value(
+            rng.sample(report_titles, min(args.batch_size, len(report_titles))))
+        _find(at.button, lambda b: 'Start Batch Search' in b.label).click()
+        timed('batch_search', at)
+
+
+def summarize(timings, elapsed, rss_start, rss_peak, rss_end, sessions):
+    frame = pd.DataFrame(timings, columns=['action', 'response', 'service'])
+    for kind, label in (('response', "响应时间（含排队）"), ('service', "服务时间")):
+        print(f"\n{label}")
+        print(f"{'操作':<16}{'次数':>6}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'最大':>9}")
+        for action, seconds in frame.groupby('action', sort=False)[kind]:
+            p50, p90, p95, p99 = np.percentile(seconds, [50, 90, 95, 99])
+            print(f"{action:<16}{len(seconds):>6}{p50:>8.2f}s{p90:>8.2f}s{p95:>8.2f}s{p99:>8.2f}s"
+                  f"{seconds.max():>8.2f}s")
+
+    measured = frame[frame['action'] != 'open']
+    print(f"\n吞吐量: {len(measured) / elapsed:.2f} 次操作/秒（{len(measured)} 次，{elapsed:.1f}s，{sessions} 个会话）")
+    mb = 1024 * 1024
+    print(f"内存(RSS): 开始 {rss_start / mb:.0f} MB | 峰值 {rss_peak / mb:.0f} MB | 结束 {rss_end / mb:.0f} MB | "
+          f"每会话增长 {(rss_end - rss_start) / sessions / mb:.1f} MB")
+
+
+def main():
+    args = parse_args()
+
+    temp_dir = None
+    if args.data_dir is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        args.data_dir = temp_dir.name
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    print(f"生成合成数据: {args.papers:,} 篇论文 × {args.references_per_paper} 条引用，{args.reports} 个报告...")
+    report_titles = generate_synthetic_data(args.data_dir, args.papers, args.references_per_paper, args.reports,
+                                            args.seed)
+    # 应用按相对路径读取预置数据
+    os.chdir(args.data_dir)
+
+    timings, errors = [], []
+    rss_start = current_rss()
+    rss_peak = rss_start
+    stop = threading.Event()
+
+    def sample_rss():
+        nonlocal rss_peak
+        while not stop.wait(0.2):
+            rss_peak = max(rss_peak, current_rss())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    print(f"运行 {args.sessions} 个并发会话，每个 {args.iterations} 轮...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        futures = [executor.submit(run_session, i, args, report_titles, timings, errors)
+                   for i in range(args.sessions)]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(f"会话异常: {e!r}")
+    elapsed = time.perf_counter() - start
+    stop.set()
+    sampler.join()
+    rss_end = current_rss()
+    rss_peak = max(rss_peak, rss_end)
+
+    summarize(timings, elapsed, rss_start, rss_peak, rss_end, args.sessions)
+    for error in errors[:10]:
+        print(f"❌ {error}")
+
+    if temp_dir is not None:
+        os.chdir(os.path.dirname(APP_PATH))
+        temp_dir.cleanup()
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -27,7 +27,8 @@ def test_dependencies():
         'numpy': 'numpy',
         'fuzzywuzzy': 'fuzzywuzzy',
         'Levenshtein': 'python-Levenshtein',
-        'plotly': 'plotly'
+        'plotly': 'plotly',
+        'scipy': 'scipy'
     }
     
     all_ok = True
@@ -52,6 +53,9 @@ def test_dependencies():
             elif module_name == 'plotly':
                 import plotly
                 version = plotly.__version__
+            elif module_name == 'scipy':
+                import scipy
+                version = scipy.__version__
             
             print(f"✅ {package_name:25s} 版本: {version}")
         except ImportError: